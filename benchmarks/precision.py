@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Compares complex64 against complex128 on random circuits drawn from the
+# same gate table as the cirq reference test in quantn/tests/circuit_test.py.
+#
+#   PYTHONPATH=. python benchmarks/precision.py --qubits 12 16 20 --repeat 3
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+import numpy as np
+import quantn as qu
+import quantn.gates as gates
+
+ops = [gates.xgate, gates.ygate, gates.zgate, gates.hgate, gates.tgate,
+  gates.controlled_xgate, gates.controlled_ygate,
+  gates.controlled_zgate, gates.controlled_hgate]
+
+def random_operations(rng, num_qubits, num_gates):
+  operations = []
+  for _ in range(num_gates):
+    gate = rng.choice(ops)
+    qubits = rng.sample(range(num_qubits), gate.num_qubits)
+    operations.append((gate,) + tuple(qubits))
+  return operations
+
+def simulate(num_qubits, operations, precision):
+  with qu.backend.precision(precision):
+    qubits = [qu.create_qubit() for _ in range(num_qubits)]
+    for operation in operations:
+      gates.apply_gate(qubits, *operation)
+    node = qu.contract_network(qubits)
+  return node, qu.eval_probability(node, normalize=True)
+
+def measure(num_qubits, operations, precision, repeat):
+  # one untraced warm up run first, tensornetwork is imported on first use
+  # and neither that nor first call caches belong in the measured figures
+  simulate(num_qubits, operations, precision)
+  times = []
+  peak = 0
+  for _ in range(repeat):
+    tracemalloc.start()
+    start = time.perf_counter()
+    node, probabilities = simulate(num_qubits, operations, precision)
+    times.append(time.perf_counter() - start)
+    peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+  return min(times), peak, probabilities, node.get_tensor()
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--qubits', type=int, nargs='+', default=[10, 14, 18])
+  parser.add_argument('--gates', type=int, default=120)
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+  rng = random.Random(args.seed)
+  results = []
+  for num_qubits in args.qubits:
+    operations = random_operations(rng, num_qubits, args.gates)
+    t_64, mem_64, p_64, state_64 = measure(num_qubits, operations, 'complex64', args.repeat)
+    t_128, mem_128, p_128, state_128 = measure(num_qubits, operations, 'complex128', args.repeat)
+    results.append({
+      'qubits': num_qubits,
+      'gates': args.gates,
+      'complex64_seconds': t_64,
+      'complex128_seconds': t_128,
+      'complex64_peak_bytes': mem_64,
+      'complex128_peak_bytes': mem_128,
+      'max_amplitude_error': float(np.max(np.abs(state_64 - state_128))),
+      'max_probability_error': float(np.max(np.abs(p_64 - p_128))),
+    })
+  print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+  main()
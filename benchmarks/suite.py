@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# Times the phases of a simulation separately over a grid of circuit
+# families, qubit counts and depths, and prints the results as JSON.
+#
+#   PYTHONPATH=. python benchmarks/suite.py --qubits 8 12 16 --depths 4 8 > run.json
+#   PYTHONPATH=. python benchmarks/suite.py --baseline run.json
+#
+# Each phase is timed best of --repeat on its own, then measured once more
+# under tracemalloc for its peak allocation, so tracing never skews the
+# timings. With --baseline the run is compared phase by phase and the
+# script exits non zero when any phase got slower than --tolerance.
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+import numpy as np
+import tensornetwork as tn
+import quantn as qu
+import quantn.gates as gates
+
+ops = [gates.xgate, gates.ygate, gates.zgate, gates.hgate, gates.tgate,
+  gates.controlled_xgate, gates.controlled_ygate,
+  gates.controlled_zgate, gates.controlled_hgate]
+
+PHASES = ['gates', 'contract', 'probability', 'sample']
+
+def random_circuit(rng, num_qubits, depth):
+  # same gate table as test_random_circuits, depth gates per qubit
+  operations = []
+  for _ in range(num_qubits * depth):
+    gate = rng.choice(ops)
+    qubits = rng.sample(range(num_qubits), min(gate.num_qubits, num_qubits))
+    if len(qubits) == gate.num_qubits:
+      operations.append((gate,) + tuple(qubits))
+  return operations
+
+def ghz_circuit(rng, num_qubits, depth):
+  operations = [(gates.hgate, 0)]
+  for q in range(num_qubits - 1):
+    operations.append((gates.controlled_xgate, q, q + 1))
+  return operations
+
+def qft_circuit(rng, num_qubits, depth):
+  operations = []
+  for q in range(num_qubits):
+    operations.append((gates.hgate, q))
+    for k, target in enumerate(range(q + 1, num_qubits), 2):
+      operations.append((gates.controlled_phasegate(2 * np.pi / 2 ** k), target, q))
+  return operations
+
+def layered_circuit(rng, num_qubits, depth):
+  # a rotation on every qubit then a brickwork of cz, depth times
+  rotations = [gates.rxgate, gates.rygate, gates.rzgate]
+  operations = []
+  for layer in range(depth):
+    for q in range(num_qubits):
+      operations.append((rng.choice(rotations)(rng.uniform(0, 2 * np.pi)), q))
+    for q in range(layer % 2, num_qubits - 1, 2):
+      operations.append((gates.controlled_zgate, q, q + 1))
+  return operations
+
+FAMILIES = {
+  'random': random_circuit,
+  'ghz': ghz_circuit,
+  'qft': qft_circuit,
+  'layered': layered_circuit,
+}
+
+# families whose shape is fixed by the qubit count alone
+DEPTHLESS = {'ghz', 'qft'}
+
+def build(num_qubits, operations):
+  qubits = [qu.create_qubit() for _ in range(num_qubits)]
+  for operation in operations:
+    gates.apply_gate(qubits, *operation)
+  return qubits
+
+def run_phases(num_qubits, operations, shots, seed):
+  # yields (phase, seconds) so the caller can wrap each one in tracemalloc
+  start = time.perf_counter()
+  qubits = build(num_qubits, operations)
+  yield 'gates', time.perf_counter() - start
+  start = time.perf_counter()
+  node = qu.contract_network(qubits)
+  yield 'contract', time.perf_counter() - start
+  start = time.perf_counter()
+  qu.eval_probability(node, normalize=True)
+  yield 'probability', time.perf_counter() - start
+  start = time.perf_counter()
+  qu.take_bitstring(node, shots=shots, rng=np.random.default_rng(seed))
+  yield 'sample', time.perf_counter() - start
+
+def time_phases(num_qubits, operations, shots, seed, repeat):
+  best = {phase: float('inf') for phase in PHASES}
+  for _ in range(repeat):
+    for phase, seconds in run_phases(num_qubits, operations, shots, seed):
+      best[phase] = min(best[phase], seconds)
+  return best
+
+def peak_memory(num_qubits, operations, shots, seed):
+  peaks = {}
+  phases = run_phases(num_qubits, operations, shots, seed)
+  while True:
+    tracemalloc.start()
+    try:
+      phase, _ = next(phases)
+      peaks[phase] = tracemalloc.get_traced_memory()[1]
+    except StopIteration:
+      return peaks
+    finally:
+      tracemalloc.stop()
+
+def benchmark(family, num_qubits, depth, args):
+  rng = random.Random('%d-%s-%d-%d' % (args.seed, family, num_qubits, depth))
+  operations = FAMILIES[family](rng, num_qubits, depth)
+  seconds = time_phases(num_qubits, operations, args.shots, args.seed, args.repeat)
+  peaks = peak_memory(num_qubits, operations, args.shots, args.seed)
+  return {
+    'family': family,
+    'qubits': num_qubits,
+    'depth': None if family in DEPTHLESS else depth,
+    'gates': len(operations),
+    'seconds': seconds,
+    'peak_bytes': peaks,
+  }
+
+def key(result):
+  return result['family'], result['qubits'], result['depth']
+
+def compare(results, baseline, tolerance):
+  previous = {key(result): result for result in baseline['results']}
+  regressions = []
+  for result in results:
+    old = previous.get(key(result))
+    if old is None:
+      continue
+    for phase in PHASES:
+      ratio = result['seconds'][phase] / max(old['seconds'][phase], 1e-9)
+      if ratio > 1 + tolerance:
+        regressions.append({
+          'family': result['family'],
+          'qubits': result['qubits'],
+          'depth': result['depth'],
+          'phase': phase,
+          'ratio': ratio,
+        })
+  return regressions
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--families', nargs='+', choices=sorted(FAMILIES),
+                      default=sorted(FAMILIES))
+  parser.add_argument('--qubits', type=int, nargs='+', default=[8, 12, 16])
+  parser.add_argument('--depths', type=int, nargs='+', default=[4, 8])
+  parser.add_argument('--shots', type=int, default=1000)
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--baseline', type=str, default=None)
+  parser.add_argument('--tolerance', type=float, default=0.25)
+  args = parser.parse_args()
+  results = []
+  for family in args.families:
+    for num_qubits in args.qubits:
+      depths = args.depths[:1] if family in DEPTHLESS else args.depths
+      for depth in depths:
+        results.append(benchmark(family, num_qubits, depth, args))
+  report = {
+    'python': platform.python_version(),
+    'numpy': np.__version__,
+    'tensornetwork': getattr(tn, '__version__', None),
+    'seed': args.seed,
+    'repeat': args.repeat,
+    'shots': args.shots,
+    'results': results,
+  }
+  if args.baseline is not None:
+    with open(args.baseline) as handle:
+      report['regressions'] = compare(results, json.load(handle), args.tolerance)
+  print(json.dumps(report, indent=2))
+  if report.get('regressions'):
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main()
@@ -1,6 +1,68 @@
-from quantn.backend import create_node
-from quantn.qubit import create_qubit, contract_network, \
-						eval_probability, take_bitstring
-from quantn.gates import xgate, ygate, zgate, hgate, tgate, \
-						controlled_xgate, controlled_ygate, \
-						controlled_zgate, controlled_hgate, apply_gate
+import importlib
+
+# Public names are resolved on first access (PEP 562), so a script that
+# only needs a Circuit never pays for the simulators, the process pool or
+# the tensornetwork backends.
+_EXPORTS = {
+	'create_node': 'quantn.backend',
+	'create_qubit': 'quantn.qubit',
+	'contract_network': 'quantn.qubit',
+	'estimate_contraction': 'quantn.qubit',
+	'eval_probability': 'quantn.qubit',
+	'take_bitstring': 'quantn.qubit',
+	'sample_bitstrings': 'quantn.qubit',
+	'amplitude': 'quantn.qubit',
+	'amplitudes': 'quantn.qubit',
+	'xgate': 'quantn.gates',
+	'ygate': 'quantn.gates',
+	'zgate': 'quantn.gates',
+	'hgate': 'quantn.gates',
+	'tgate': 'quantn.gates',
+	'controlled_xgate': 'quantn.gates',
+	'controlled_ygate': 'quantn.gates',
+	'controlled_zgate': 'quantn.gates',
+	'controlled_hgate': 'quantn.gates',
+	'apply_gate': 'quantn.gates',
+	'unitary_gate': 'quantn.gates',
+	'rxgate': 'quantn.gates',
+	'rygate': 'quantn.gates',
+	'rzgate': 'quantn.gates',
+	'phasegate': 'quantn.gates',
+	'controlled_phasegate': 'quantn.gates',
+	'controlled_gate': 'quantn.gates',
+	'diagonal_gate': 'quantn.gates',
+	'Parameter': 'quantn.gates',
+	'depolarizing_channel': 'quantn.gates',
+	'amplitude_damping_channel': 'quantn.gates',
+	'readout_error': 'quantn.gates',
+	'StateVectorSimulator': 'quantn.simulator',
+	'simulate': 'quantn.simulator',
+	'Circuit': 'quantn.circuit',
+	'MPSSimulator': 'quantn.mps',
+	'execute_batch': 'quantn.execution',
+	'expectation': 'quantn.observables',
+	'IncrementalEvaluator': 'quantn.incremental',
+	'DensityState': 'quantn.noise',
+	'density_matrix': 'quantn.noise',
+	'sample_noisy': 'quantn.noise',
+}
+
+__all__ = sorted(_EXPORTS)
+
+# submodules stay reachable as attributes, `quantn.gates.xgate` included
+_SUBMODULES = ('backend', 'chunked', 'circuit', 'contraction', 'execution',
+	'fusion', 'gates', 'incremental', 'instrument', 'mps', 'noise',
+	'observables', 'qubit', 'serialization', 'simulator')
+
+def __getattr__(name):
+	if name in _EXPORTS:
+		value = getattr(importlib.import_module(_EXPORTS[name]), name)
+	elif name in _SUBMODULES:
+		value = importlib.import_module('quantn.' + name)
+	else:
+		raise AttributeError("module 'quantn' has no attribute " + repr(name))
+	globals()[name] = value
+	return value
+
+def __dir__():
+	return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
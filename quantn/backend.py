@@ -1,9 +1,166 @@
+from __future__ import annotations
+import importlib.util
+import sys
 import numpy as np
-import tensornetwork as tn
-from typing import List, Optional
+import quantn.instrument as instrument
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+def lazy_import(name: str) -> ModuleType:
+    # tensornetwork pulls in scipy and friends, which is most of the time
+    # `import quantn` takes, so heavy dependencies are only executed on
+    # first attribute access
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError("No module named " + repr(name), name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+tn = lazy_import('tensornetwork')
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+PRECISIONS = {
+    'complex64': np.dtype(np.complex64),
+    'complex128': np.dtype(np.complex128),
+    'single': np.dtype(np.complex64),
+    'double': np.dtype(np.complex128),
+}
+
+_dtype = np.dtype(np.complex128)
+
+def resolve_dtype(precision: Any = None) -> np.dtype:
+    if precision is None:
+        return _dtype
+    if isinstance(precision, str):
+        if precision not in PRECISIONS:
+            raise ValueError("Unknown precision " + precision)
+        return PRECISIONS[precision]
+    dtype = np.dtype(precision)
+    if dtype not in PRECISIONS.values():
+        raise ValueError("Unsupported precision " + str(dtype))
+    return dtype
+
+def get_dtype() -> np.dtype:
+    return _dtype
+
+def set_precision(precision: Any) -> None:
+    global _dtype
+    _dtype = resolve_dtype(precision)
+
+@contextmanager
+def precision(value: Any) -> Iterator[np.dtype]:
+    global _dtype
+    previous = _dtype
+    _dtype = resolve_dtype(value)
+    try:
+        yield _dtype
+    finally:
+        _dtype = previous
 
 def create_node(value: List, with_shape: Optional[List] = None) -> tn.Node:
     if with_shape is not None:
         value = np.reshape(value, with_shape)
-    tensor = np.array(value, dtype=complex)
+    tensor = np.array(value, dtype=_dtype)
     return tn.Node(tensor)
+
+def freeze_tensor(value: Any, with_shape: Optional[List] = None,
+                  dtype: Any = None) -> np.ndarray:
+    if with_shape is not None:
+        value = np.reshape(value, with_shape)
+    tensor = np.array(value, dtype=resolve_dtype(dtype))
+    tensor.setflags(write=False)
+    return tensor
+
+class GateRegistry:
+    # Constant gate tensors are built once on first use and kept forever,
+    # parameterized ones live in a bounded LRU keyed on their parameters.
+    # Every tensor handed out is read-only so nodes can share it safely.
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._constants: Dict[str, Tuple[Any, Optional[List]]] = {}
+        self._factories: Dict[str, Tuple[Callable, Optional[List]]] = {}
+        self._tensors: Dict[Tuple[str, np.dtype], np.ndarray] = {}
+        self._lru: 'OrderedDict[Hashable, np.ndarray]' = OrderedDict()
+
+    def register(self, name: str, value: Any,
+                with_shape: Optional[List] = None) -> None:
+        if name in self._constants or name in self._factories:
+            raise ValueError("Gate " + name + " is already registered")
+        self._constants[name] = (value, with_shape)
+
+    def register_parameterized(self, name: str, factory: Callable,
+                              with_shape: Optional[List] = None) -> None:
+        if name in self._constants or name in self._factories:
+            raise ValueError("Gate " + name + " is already registered")
+        self._factories[name] = (factory, with_shape)
+
+    def tensor(self, name: str, *params: Hashable,
+               dtype: Any = None) -> np.ndarray:
+        dtype = resolve_dtype(dtype)
+        if name in self._constants:
+            if params:
+                raise ValueError("Gate " + name + " takes no parameters")
+            tensor = self._tensors.get((name, dtype))
+            if tensor is None:
+                self.misses += 1
+                tensor = freeze_tensor(*self._constants[name], dtype=dtype)
+                self._tensors[(name, dtype)] = tensor
+            else:
+                self.hits += 1
+            return tensor
+        if name not in self._factories:
+            raise ValueError("Unknown gate " + name)
+        key = (name, dtype) + params
+        tensor = self._lru.get(key)
+        if tensor is not None:
+            self.hits += 1
+            self._lru.move_to_end(key)
+            return tensor
+        self.misses += 1
+        factory, with_shape = self._factories[name]
+        tensor = freeze_tensor(factory(*params), with_shape, dtype)
+        self._lru[key] = tensor
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+        return tensor
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                        len(self._tensors) + len(self._lru))
+
+    def clear(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._tensors.clear()
+        self._lru.clear()
+
+registry = GateRegistry()
+
+def register_gate(name: str, value: Any,
+                with_shape: Optional[List] = None) -> None:
+    registry.register(name, value, with_shape)
+
+def register_parameterized_gate(name: str, factory: Callable,
+                                with_shape: Optional[List] = None) -> None:
+    registry.register_parameterized(name, factory, with_shape)
+
+def gate_tensor(name: str, *params: Hashable, dtype: Any = None) -> np.ndarray:
+    return registry.tensor(name, *params, dtype=dtype)
+
+def create_gate_node(name: str, *params: Hashable) -> tn.Node:
+    node = tn.Node(registry.tensor(name, *params))
+    if instrument._sinks:
+        instrument.node_created(name, node)
+    return node
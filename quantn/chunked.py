@@ -0,0 +1,90 @@
+from __future__ import annotations
+import os
+import numpy as np
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Sequence, Text, Union
+from quantn.backend import lazy_import
+import quantn.contraction as contraction
+from quantn.qubit import sample_from_cdf
+tn = lazy_import('tensornetwork')
+
+# Everything here streams over 2**n element files in blocks, so peak RAM
+# is set by chunk_bytes rather than by the number of qubits.
+
+DEFAULT_CHUNK_BYTES = 64 * 2 ** 20
+
+DiskState = namedtuple('DiskState', ['state', 'probabilities', 'cdf', 'shape'])
+
+def _chunk_length(total: int, itemsize: int, chunk_bytes: int) -> int:
+  length = 1
+  while length < total and 2 * length * itemsize <= chunk_bytes:
+    length *= 2
+  return length
+
+def contract_to_memmap(edges: Sequence[tn.Edge], filename: Text,
+                       chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                       strategy: Union[Text, Callable] = 'greedy') -> np.memmap:
+  spec = contraction.network_spec(edges)
+  dtype = np.result_type(*[node.tensor for node in spec.nodes])
+  shape = tuple(spec.size_dict[s] for s in spec.output)
+  total = int(np.prod(shape))
+  # fix leading output edges until one block of the state fits a chunk
+  num_fixed = 0
+  block = total
+  while num_fixed < len(shape) and block * dtype.itemsize > chunk_bytes:
+    block //= shape[num_fixed]
+    num_fixed += 1
+  state = np.memmap(filename, dtype=dtype, mode='w+', shape=(total,))
+  offset = 0
+  for _, chunk in contraction.contract_chunks(spec, num_fixed, strategy):
+    chunk = np.asarray(chunk).ravel()
+    state[offset:offset + chunk.size] = chunk
+    offset += chunk.size
+  state.flush()
+  return state
+
+def probabilities_to_memmap(state: np.ndarray, filename: Text,
+                            normalize: bool = True,
+                            chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> np.memmap:
+  probabilities = np.memmap(filename, dtype=np.float64, mode='w+',
+                            shape=(state.size,))
+  length = _chunk_length(state.size, state.itemsize, chunk_bytes)
+  total = 0.0
+  for start in range(0, state.size, length):
+    block = np.square(np.abs(state[start:start + length]), dtype=np.float64)
+    probabilities[start:start + length] = block
+    total += float(np.sum(block))
+  if normalize:
+    for start in range(0, state.size, length):
+      probabilities[start:start + length] /= total
+  probabilities.flush()
+  return probabilities
+
+def cdf_to_memmap(probabilities: np.ndarray, filename: Text,
+                  chunk_bytes: int = DEFAULT_CHUNK_BYTES) -> np.memmap:
+  cdf = np.memmap(filename, dtype=np.float64, mode='w+', shape=(probabilities.size,))
+  length = _chunk_length(probabilities.size, cdf.itemsize, chunk_bytes)
+  carry = 0.0
+  for start in range(0, probabilities.size, length):
+    block = np.cumsum(probabilities[start:start + length]) + carry
+    cdf[start:start + length] = block
+    carry = float(block[-1])
+  cdf.flush()
+  return cdf
+
+def contract_to_disk(edges: Sequence[tn.Edge], directory: Text,
+                     chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                     strategy: Union[Text, Callable] = 'greedy') -> DiskState:
+  os.makedirs(directory, exist_ok=True)
+  shape = tuple(edge.dimension for edge in edges)
+  state = contract_to_memmap(edges, os.path.join(directory, 'state.bin'),
+                             chunk_bytes, strategy)
+  probabilities = probabilities_to_memmap(
+    state, os.path.join(directory, 'probabilities.bin'), True, chunk_bytes)
+  cdf = cdf_to_memmap(probabilities, os.path.join(directory, 'cdf.bin'), chunk_bytes)
+  return DiskState(state, probabilities, cdf, shape)
+
+def sample_from_disk(disk_state: DiskState, shots: int,
+                     rng: Optional[np.random.Generator] = None,
+                     format: Text = 'str') -> Union[List, np.ndarray, Dict]:
+  return sample_from_cdf(disk_state.cdf, disk_state.shape, shots, rng, format)
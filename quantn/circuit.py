@@ -0,0 +1,318 @@
+from __future__ import annotations
+import itertools
+import time
+import numpy as np
+from array import array
+from collections import namedtuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import quantn.backend as backend
+import quantn.contraction as contraction
+import quantn.fusion as fusion
+import quantn.instrument as instrument
+import quantn.gates as gates
+import quantn.simulator as simulator
+from quantn.qubit import create_qubit
+tn = backend.lazy_import('tensornetwork')
+
+ContractionPlan = namedtuple('ContractionPlan',
+                             ['spec', 'path', 'expression', 'tensors', 'gate_nodes',
+                              'dtype'])
+
+def _structure(gate: Callable) -> Optional[Tuple]:
+  # the operand shapes and subscripts one application adds on fixed input
+  # symbols, two gates with equal structure can share a compiled plan
+  if gates.is_channel(gate):
+    return None
+  params = {param: 0.0 for param in gate.params if isinstance(param, gates.Parameter)}
+  symbols = iter(contraction.oe.get_symbol(i) for i in itertools.count())
+  inputs = [next(symbols) for _ in range(gate.num_qubits)]
+  operands, outputs, index = gates.gate_terms(gates.bind(gate, params), inputs,
+                                              lambda: next(symbols))
+  return tuple((tensor.shape, term) for tensor, term in operands), tuple(outputs), index
+
+class Operations:
+  # Records (gate, *qubits) operations without a tuple per entry: gates sit
+  # in one list and their qubits in one flat int array, so a circuit of
+  # 10**5 gates costs a few bytes per gate until its network is built.
+  __slots__ = ('_gates', '_qubits', '_offsets')
+
+  def __init__(self, operations: Iterable[Tuple] = ()) -> None:
+    self._gates: List[Callable] = []
+    self._qubits = array('i')
+    self._offsets = array('i', [0])
+    for operation in operations:
+      self.append(operation)
+
+  def append(self, operation: Tuple) -> None:
+    self._gates.append(operation[0])
+    self._qubits.extend(operation[1:])
+    self._offsets.append(len(self._qubits))
+
+  def __len__(self) -> int:
+    return len(self._gates)
+
+  def _get(self, index: int) -> Tuple:
+    start, end = self._offsets[index], self._offsets[index + 1]
+    return (self._gates[index],) + tuple(self._qubits[start:end])
+
+  def __getitem__(self, index: Union[int, slice]) -> Union[Tuple, List[Tuple]]:
+    if isinstance(index, slice):
+      return [self._get(i) for i in range(*index.indices(len(self)))]
+    if index < 0:
+      index += len(self)
+    if not 0 <= index < len(self):
+      raise IndexError("Operation index out of range")
+    return self._get(index)
+
+  def __setitem__(self, index: int, operation: Tuple) -> None:
+    # only the gate can change in place, the qubits must stay the same
+    if tuple(operation[1:]) != self[index][1:]:
+      raise ValueError("Replacement must act on the same qubits")
+    self._gates[index if index >= 0 else index + len(self)] = operation[0]
+
+  def __iter__(self) -> Iterator[Tuple]:
+    return (self._get(i) for i in range(len(self)))
+
+  def __eq__(self, other: object) -> bool:
+    return list(self) == list(other)
+
+  def __repr__(self) -> str:
+    return 'Operations(' + repr(list(self)) + ')'
+
+class Circuit:
+  def __init__(self, num_qubits: int, precision: Any = None) -> None:
+    if num_qubits < 1:
+      raise ValueError("Circuit requires at least one qubit")
+    self.num_qubits = num_qubits
+    # None follows the global backend precision at compile time
+    self.precision = precision
+    self._operations = Operations()
+    self.compile_time: Optional[float] = None
+    self.execute_time: Optional[float] = None
+    self._plan: Optional[ContractionPlan] = None
+    self._sweep: Optional[Tuple] = None
+
+  def __len__(self) -> int:
+    return len(self._operations)
+
+  @property
+  def operations(self) -> Operations:
+    return self._operations
+
+  @operations.setter
+  def operations(self, operations: Iterable[Tuple]) -> None:
+    self._operations = Operations(operations)
+    self._plan = None
+
+  def _check_qubits(self, gate: Callable, qubits: Tuple[int, ...]) -> None:
+    if len(qubits) != getattr(gate, 'num_qubits', len(qubits)):
+      raise ValueError("Gate expects " + str(gate.num_qubits) + " qubits")
+    if len(set(qubits)) != len(qubits):
+      raise ValueError("Gate qubits must be distinct")
+    for q in qubits:
+      if not 0 <= q < self.num_qubits:
+        raise ValueError("Qubit index out of range")
+
+  def apply_gate(self, gate: Callable, *qubits: int) -> 'Circuit':
+    self._check_qubits(gate, qubits)
+    self.operations.append((gate,) + qubits)
+    self._plan = None
+    return self
+
+  def set_gate(self, index: int, gate: Callable) -> None:
+    # swapping a gate for one with the same footprint keeps the network
+    # structure, so the compiled path stays valid
+    previous, *qubits = self.operations[index]
+    qubits = tuple(qubits)
+    self._check_qubits(gate, qubits)
+    if _structure(gate) != _structure(previous):
+      self._plan = None
+    self.operations[index] = (gate,) + qubits
+
+  def optimize(self, atol: float = 1e-12) -> fusion.FusionReport:
+    self.operations, report = fusion.fuse_gates(self.operations, atol)
+    self._plan = None
+    return report
+
+  def describe(self) -> Tuple:
+    # plain data only, so circuits can cross process boundaries without
+    # dragging live tensornetwork graphs along
+    precision = None if self.precision is None else str(self.dtype)
+    operations = [gates.describe_gate(gate) + (tuple(qubits),)
+                  for gate, *qubits in self.operations]
+    return self.num_qubits, precision, operations
+
+  @classmethod
+  def from_description(cls, description: Tuple) -> 'Circuit':
+    num_qubits, precision, operations = description
+    circuit = cls(num_qubits, precision)
+    for name, params, tensor, qubits in operations:
+      circuit.apply_gate(gates.rebuild_gate(name, params, tensor), *qubits)
+    return circuit
+
+  @property
+  def parameters(self) -> List[gates.Parameter]:
+    parameters = []
+    for operation in self.operations:
+      for param in operation[0].params:
+        if isinstance(param, gates.Parameter) and param not in parameters:
+          parameters.append(param)
+    return parameters
+
+  def build(self, params: Optional[Dict] = None
+            ) -> Tuple[List[tn.Edge], List[tn.Node], List[tn.Node]]:
+    if params is None:
+      # placeholders are enough when only the network structure matters
+      params = {param: 0.0 for param in self.parameters}
+    with backend.precision(self.dtype):
+      qubits = [create_qubit() for _ in range(self.num_qubits)]
+      gate_nodes = []
+      for gate, *targets in self.operations:
+        gates.apply_gate(qubits, gates.bind(gate, params), *targets)
+        gate_nodes.append(gates.tensor_node(qubits[targets[-1]]))
+    return qubits, contraction.collect_nodes(qubits), gate_nodes
+
+  def _network(self, terms: Callable = gates.gate_terms
+               ) -> Tuple[contraction.NetworkSpec, List, List[int]]:
+    # the einsum form of build() worked out straight from the operation
+    # records, no tensornetwork nodes or edges are created on the way.
+    # `terms` follows gates.gate_terms and may add operations of its own
+    size_dict: Dict[str, int] = {}
+    def symbol() -> str:
+      s = contraction.oe.get_symbol(len(size_dict))
+      size_dict[s] = 2
+      return s
+    params = {param: 0.0 for param in self.parameters}
+    wires = [symbol() for _ in range(self.num_qubits)]
+    zero = np.array([1, 0], dtype=self.dtype)
+    tensors = [zero] * self.num_qubits
+    inputs = list(wires)
+    gate_nodes = []
+    for gate, *targets in self.operations:
+      operands, outputs, index = terms(
+        gates.bind(gate, params), [wires[q] for q in targets], symbol, self.dtype)
+      gate_nodes.append(len(inputs) + index)
+      for tensor, term in operands:
+        tensors.append(tensor)
+        inputs.append(term)
+      for q, s in zip(targets, outputs):
+        wires[q] = s
+    spec = contraction.NetworkSpec(None, inputs, ''.join(wires), size_dict)
+    return spec, tensors, gate_nodes
+
+  def compile(self, cache: Any = None) -> ContractionPlan:
+    # cache is a serialization.CircuitCache, or anything with its methods
+    start = time.perf_counter()
+    spec, tensors, gate_nodes = self._network()
+    path = cache.get_path(self) if cache is not None else None
+    if path is None:
+      with instrument.span('find_path', 'plan', nodes=len(spec.inputs)):
+        path = contraction.greedy_path(spec)
+      if cache is not None:
+        cache.put_path(self, path)
+    expression = contraction.einsum_expression(spec, path)
+    self._plan = ContractionPlan(spec, path, expression, tensors, gate_nodes,
+                                 self.dtype)
+    self.compile_time = time.perf_counter() - start
+    return self._plan
+
+  @property
+  def dtype(self) -> np.dtype:
+    return backend.resolve_dtype(self.precision)
+
+  @property
+  def compiled(self) -> bool:
+    return self._plan is not None and self._plan.dtype == self.dtype
+
+  def _current_plan(self, cache: Any = None) -> ContractionPlan:
+    return self._plan if self.compiled else self.compile(cache)
+
+  def execute(self, params: Optional[Dict] = None, cache: Any = None) -> tn.Node:
+    if cache is not None:
+      state = cache.get_state(self, params)
+      if state is not None:
+        return tn.Node(state)
+    plan = self._current_plan(cache)
+    start = time.perf_counter()
+    tensors = list(plan.tensors)
+    for index, operation in zip(plan.gate_nodes, self.operations):
+      gate = gates.bind(operation[0], params or {})
+      tensors[index] = gates.gate_tensor(gate, plan.dtype)
+    with instrument.span('contract', 'contract', steps=len(plan.path)):
+      if instrument._sinks:
+        # step by step, so the recorder sees every intermediate
+        result = np.asarray(contraction.contract(plan.spec, tensors, plan.path))
+      else:
+        result = np.asarray(plan.expression(*tensors))
+    self.execute_time = time.perf_counter() - start
+    if cache is not None:
+      cache.put_state(self, result, params)
+    return tn.Node(result)
+
+  def _sweep_plan(self, plan: ContractionPlan) -> Tuple:
+    # set_gate may turn a gate symbolic without touching the plan, so the
+    # batched network is keyed on which gates carry the batch axis too
+    symbolic = tuple(gates.is_symbolic(operation[0]) for operation in self.operations)
+    if self._sweep is not None and self._sweep[0] is plan and self._sweep[3] == symbolic:
+      return self._sweep
+    # parameterized gate tensors gain a leading batch axis that is carried
+    # through to the output, the path is planned with a token batch size
+    spec = plan.spec
+    batch = contraction.oe.get_symbol(len(spec.size_dict))
+    inputs = list(spec.inputs)
+    for index, operation in zip(plan.gate_nodes, self.operations):
+      if gates.is_symbolic(operation[0]):
+        inputs[index] = batch + inputs[index]
+    size_dict = dict(spec.size_dict)
+    size_dict[batch] = 2
+    batched = contraction.NetworkSpec(None, inputs, batch + spec.output, size_dict)
+    self._sweep = (plan, batched, contraction.find_path(batched), symbolic)
+    return self._sweep
+
+  def _sweep_columns(self, values: Union[Dict, np.ndarray]) -> Dict:
+    parameters = self.parameters
+    if isinstance(values, dict):
+      columns = {}
+      for param in parameters:
+        if param in values:
+          columns[param] = np.asarray(values[param], dtype=float)
+        elif param.name in values:
+          columns[param] = np.asarray(values[param.name], dtype=float)
+        else:
+          raise ValueError("No values given for parameter " + param.name)
+    else:
+      values = np.asarray(values, dtype=float)
+      if values.ndim != 2 or values.shape[1] != len(parameters):
+        raise ValueError("Sweep values must be shaped (batch, " +
+                         str(len(parameters)) + ")")
+      columns = {param: values[:, i] for i, param in enumerate(parameters)}
+    lengths = {column.shape for column in columns.values()}
+    if len(lengths) != 1 or len(next(iter(lengths))) != 1:
+      raise ValueError("Every parameter needs one value per batch entry")
+    return columns
+
+  def sweep(self, values: Union[Dict, np.ndarray]) -> np.ndarray:
+    if not self.parameters:
+      raise ValueError("Circuit has no parameters to sweep")
+    columns = self._sweep_columns(values)
+    plan = self._current_plan()
+    start = time.perf_counter()
+    _, batched, path, _ = self._sweep_plan(plan)
+    tensors = list(plan.tensors)
+    for index, operation in zip(plan.gate_nodes, self.operations):
+      gate = operation[0]
+      if gates.is_symbolic(gate):
+        tensors[index] = gates.batch_tensor(gate, columns[gate.params[0]], plan.dtype)
+      else:
+        tensors[index] = gates.gate_tensor(gate, plan.dtype)
+    result = contraction.contract(batched, tensors, path)
+    self.execute_time = time.perf_counter() - start
+    return result.reshape(len(result), -1)
+
+  def simulate(self, engine: str = 'auto', max_bond: Optional[int] = None,
+               cutoff: float = 1e-12) -> tn.Node:
+    if engine == 'compiled':
+      return self.execute()
+    return simulator.simulate(self.num_qubits, self.operations, engine=engine,
+                              precision=self.dtype, max_bond=max_bond,
+                              cutoff=cutoff)
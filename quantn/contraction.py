@@ -0,0 +1,281 @@
+from __future__ import annotations
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque, namedtuple
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from quantn.backend import lazy_import
+import quantn.instrument as instrument
+tn = lazy_import('tensornetwork')
+oe = lazy_import('opt_einsum')
+
+NetworkSpec = namedtuple('NetworkSpec', ['nodes', 'inputs', 'output', 'size_dict'])
+
+def collect_nodes(edges: Sequence[tn.Edge]) -> List[tn.Node]:
+  # breadth first from the output edges so the node order, and with it
+  # the contraction path, is the same every time the network is built
+  nodes = []
+  seen = set()
+  frontier = deque(edge.node1 for edge in edges)
+  while frontier:
+    node = frontier.popleft()
+    if id(node) in seen:
+      continue
+    seen.add(id(node))
+    nodes.append(node)
+    for edge in node.edges:
+      for neighbour in (edge.node1, edge.node2):
+        if neighbour is not None and id(neighbour) not in seen:
+          frontier.append(neighbour)
+  return nodes
+
+def _copy_groups(nodes: Sequence[tn.Node]) -> Dict[int, int]:
+  # every edge of a COPY node carries the same index, so they are merged
+  # into one hyperedge and the COPY node itself never becomes an operand
+  parent: Dict[int, int] = {}
+  def find(key: int) -> int:
+    while parent.get(key, key) != key:
+      key = parent[key]
+    return key
+  for node in nodes:
+    if isinstance(node, tn.CopyNode):
+      root = find(id(node.edges[0]))
+      for edge in node.edges[1:]:
+        other = find(id(edge))
+        if other != root:
+          parent[other] = root
+  return {key: find(key) for key in parent}
+
+def network_spec(edges: Sequence[tn.Edge],
+                 nodes: Optional[Sequence[tn.Node]] = None) -> NetworkSpec:
+  if nodes is None:
+    nodes = collect_nodes(edges)
+  groups = _copy_groups(nodes)
+  nodes = [node for node in nodes if not isinstance(node, tn.CopyNode)]
+  symbols: Dict[int, str] = {}
+  size_dict: Dict[str, int] = {}
+  def symbol(edge: tn.Edge) -> str:
+    key = groups.get(id(edge), id(edge))
+    if key not in symbols:
+      symbols[key] = oe.get_symbol(len(symbols))
+      size_dict[symbols[key]] = edge.dimension
+    return symbols[key]
+  output = ''.join(symbol(edge) for edge in edges)
+  inputs = [''.join(symbol(edge) for edge in node.edges) for node in nodes]
+  for node in nodes:
+    for edge in node.edges:
+      if edge.is_dangling() and symbol(edge) not in output:
+        raise ValueError("Dangling edge missing from output edge order")
+  return NetworkSpec(nodes, inputs, output, size_dict)
+
+def has_hyperedges(spec: NetworkSpec) -> bool:
+  # pairwise node contraction cannot follow a path over merged COPY edges
+  counts: Dict[str, int] = {}
+  for term in spec.inputs + [spec.output]:
+    for s in term:
+      counts[s] = counts.get(s, 0) + 1
+  return any(count > 2 for count in counts.values())
+
+# named strategies map onto opt_einsum path optimizers, a callable strategy
+# follows the opt_einsum convention (input_sets, output_set, size_dict) -> path
+STRATEGIES = {
+  'greedy': 'greedy',
+  'optimal': 'optimal',
+  'branch': 'branch-all',
+  'auto': 'auto',
+}
+
+ContractionEstimate = namedtuple('ContractionEstimate', ['flops', 'peak_size', 'path'])
+
+def _equation(spec: NetworkSpec) -> str:
+  return ','.join(spec.inputs) + '->' + spec.output
+
+def _shapes(spec: NetworkSpec) -> List[Tuple[int, ...]]:
+  return [tuple(spec.size_dict[s] for s in term) for term in spec.inputs]
+
+def _path_info(spec: NetworkSpec, strategy: Union[str, Callable]):
+  if callable(strategy):
+    input_sets = [set(term) for term in spec.inputs]
+    optimize = list(strategy(input_sets, set(spec.output), spec.size_dict))
+  elif strategy in STRATEGIES:
+    optimize = STRATEGIES[strategy]
+  else:
+    raise ValueError("Unknown contraction strategy " + str(strategy))
+  return oe.contract_path(_equation(spec), *_shapes(spec),
+                          shapes=True, optimize=optimize)
+
+def find_path(spec: NetworkSpec,
+              strategy: Union[str, Callable] = 'greedy') -> List[Tuple[int, ...]]:
+  if len(spec.inputs) == 1:
+    return [(0,)]
+  path, _ = _path_info(spec, strategy)
+  return list(path)
+
+def greedy_path(spec: NetworkSpec) -> List[Tuple[int, ...]]:
+  return find_path(spec, 'greedy')
+
+def estimate(spec: NetworkSpec,
+             strategy: Union[str, Callable] = 'greedy') -> ContractionEstimate:
+  path, info = _path_info(spec, strategy)
+  return ContractionEstimate(int(info.opt_cost), int(info.largest_intermediate),
+                             list(path))
+
+def contract(spec: NetworkSpec, tensors: Sequence,
+             path: Sequence[Tuple[int, ...]]):
+  if instrument._sinks:
+    return _contract_steps(spec, tensors, path)
+  return oe.contract(_equation(spec), *tensors, optimize=list(path))
+
+def _contract_steps(spec: NetworkSpec, tensors: Sequence,
+                    path: Sequence[Tuple[int, ...]]):
+  # the path taken one einsum at a time so every intermediate is reported,
+  # a symbol survives a step while a remaining operand or the output has it,
+  # which keeps hyperedges open until their last operand is absorbed
+  terms = list(spec.inputs)
+  tensors = list(tensors)
+  for step in path:
+    start = time.perf_counter()
+    picked = [(terms[i], tensors[i]) for i in step]
+    for i in sorted(step, reverse=True):
+      del terms[i]
+      del tensors[i]
+    keep = set(spec.output).union(*terms)
+    term = ''.join(dict.fromkeys(s for t, _ in picked for s in t if s in keep))
+    equation = ','.join(t for t, _ in picked) + '->' + term
+    tensor = oe.contract(equation, *[t for _, t in picked])
+    terms.append(term)
+    tensors.append(tensor)
+    instrument.emit('intermediate', 'contract', start, time.perf_counter() - start,
+                    shape=tuple(tensor.shape), bytes=int(tensor.nbytes))
+  return oe.contract(terms[0] + '->' + spec.output, tensors[0])
+
+def contract_nodes(path: Sequence[Tuple[int, ...]], nodes: Sequence[tn.Node],
+                   output_edge_order: Sequence[tn.Edge]) -> tn.Node:
+  # the same pairwise walk as tensornetwork's contract_path, spelled out so
+  # every intermediate can be reported while instrumentation is listening
+  if not instrument._sinks or len(nodes) == 1:
+    return tn.contractors.contract_path(list(path), list(nodes), output_edge_order)
+  for edge in tn.get_all_edges(nodes):
+    if not edge.is_disabled and edge.is_trace():
+      tn.contract_parallel(edge)
+  nodes = list(nodes)
+  for step in path:
+    start = time.perf_counter()
+    if len(step) == 1:
+      node = tn.contract_trace_edges(nodes.pop(step[0]))
+    else:
+      a, b = step
+      node = tn.contract_between(nodes[a], nodes[b], allow_outer_product=True)
+      for i in sorted(step, reverse=True):
+        del nodes[i]
+    nodes.append(node)
+    tensor = node.tensor
+    instrument.emit('intermediate', 'contract', start, time.perf_counter() - start,
+                    shape=tuple(tensor.shape), bytes=int(tensor.nbytes))
+  node = tn.contract_trace_edges(nodes[0])
+  return node.reorder_edges(output_edge_order)
+
+def einsum_expression(spec: NetworkSpec, path: Sequence[Tuple[int, ...]]):
+  return oe.contract_expression(_equation(spec), *_shapes(spec),
+                                optimize=list(path))
+
+def _remove_symbols(spec: NetworkSpec, symbols: Sequence[str]) -> NetworkSpec:
+  inputs = [''.join(s for s in term if s not in symbols) for term in spec.inputs]
+  size_dict = {s: d for s, d in spec.size_dict.items() if s not in symbols}
+  return NetworkSpec(spec.nodes, inputs, spec.output, size_dict)
+
+def _largest_intermediate(info) -> str:
+  # the output indices of the contraction step with the biggest result
+  sizes = list(info.size_list)
+  if not sizes:
+    return ''
+  step = info.contraction_list[sizes.index(max(sizes))]
+  return step[2].split('->')[1]
+
+def choose_slices(spec: NetworkSpec, memory_limit: int, itemsize: int = 16,
+                  strategy: Union[str, Callable] = 'greedy') -> List[str]:
+  # greedily fix the bond that shrinks the largest intermediate the most
+  # until every intermediate fits under memory_limit bytes
+  sliced: List[str] = []
+  current = spec
+  _, info = _path_info(current, strategy)
+  while info.largest_intermediate * itemsize > memory_limit:
+    candidates = [s for s in _largest_intermediate(info)
+                  if s not in spec.output and
+                  all(term.count(s) < 2 for term in current.inputs)]
+    if not candidates:
+      raise ValueError("Unable to slice network under memory limit of " +
+                       str(memory_limit) + " bytes")
+    best = None
+    for symbol in candidates:
+      trial = _remove_symbols(current, sliced + [symbol])
+      _, trial_info = _path_info(trial, strategy)
+      if best is None or trial_info.largest_intermediate < best[1].largest_intermediate:
+        best = (symbol, trial_info)
+    sliced.append(best[0])
+    current = _remove_symbols(spec, sliced)
+    info = best[1]
+  return sliced
+
+def _slice_tensors(inputs: Sequence[str], tensors: Sequence, symbols: Sequence[str],
+                   assignment: Sequence[int]) -> List:
+  sliced = []
+  for term, tensor in zip(inputs, tensors):
+    index = tuple(assignment[symbols.index(s)] if s in symbols else slice(None)
+                  for s in term)
+    sliced.append(tensor[index] if any(s in symbols for s in term) else tensor)
+  return sliced
+
+def _assignments(spec: NetworkSpec, symbols: Sequence[str], start: int = 0,
+                 step: int = 1) -> Iterator[Tuple[int, ...]]:
+  ranges = [range(spec.size_dict[s]) for s in symbols]
+  return itertools.islice(itertools.product(*ranges), start, None, step)
+
+def _contract_slices(spec: NetworkSpec, equation: str,
+                     path: Sequence[Tuple[int, ...]], tensors: Sequence,
+                     symbols: Sequence[str], start: int = 0, step: int = 1):
+  total = None
+  for assignment in _assignments(spec, symbols, start, step):
+    operands = _slice_tensors(spec.inputs, tensors, symbols, assignment)
+    result = oe.contract(equation, *operands, optimize=list(path))
+    total = result if total is None else total + result
+  return total
+
+def contract_sliced(spec: NetworkSpec, symbols: Sequence[str],
+                    strategy: Union[str, Callable] = 'greedy',
+                    workers: Optional[int] = None):
+  sliced = _remove_symbols(spec, symbols)
+  path = find_path(sliced, strategy)
+  tensors = [node.tensor for node in spec.nodes]
+  # nodes stay behind, workers only need the subscripts and the arrays
+  portable = NetworkSpec(None, spec.inputs, spec.output, spec.size_dict)
+  args = (portable, _equation(sliced), path, tensors, list(symbols))
+  num_slices = 1
+  for s in symbols:
+    num_slices *= spec.size_dict[s]
+  if not workers or workers == 1 or num_slices == 1:
+    return _contract_slices(*args)
+  workers = min(workers, num_slices)
+  total = None
+  with ProcessPoolExecutor(max_workers=workers) as pool:
+    futures = [pool.submit(_contract_slices, *args, i, workers)
+               for i in range(workers)]
+    for future in futures:
+      result = future.result()
+      total = result if total is None else total + result
+  return total
+
+def contract_chunks(spec: NetworkSpec, num_fixed: int,
+                    strategy: Union[str, Callable] = 'greedy'
+                    ) -> Iterator[Tuple[Tuple[int, ...], object]]:
+  # fix the leading `num_fixed` output indices, so each result is one
+  # contiguous block of the full output in C order
+  fixed = list(spec.output[:num_fixed])
+  sliced = _remove_symbols(spec, fixed)
+  sliced = NetworkSpec(spec.nodes, sliced.inputs, spec.output[num_fixed:],
+                       sliced.size_dict)
+  path = find_path(sliced, strategy)
+  tensors = [node.tensor for node in spec.nodes]
+  for assignment in _assignments(spec, fixed):
+    operands = _slice_tensors(spec.inputs, tensors, fixed, assignment)
+    yield assignment, contract(sliced, operands, path)
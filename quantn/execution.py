@@ -0,0 +1,37 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, List, Optional, Sequence, Text
+import quantn.serialization as serialization
+from quantn.circuit import Circuit
+from quantn.qubit import sample_bitstrings
+
+def _run(data: bytes, shots: int, seed: np.random.SeedSequence,
+         engine: Text, format: Text) -> Any:
+  circuit = serialization.loads(data)
+  node = circuit.simulate(engine)
+  return sample_bitstrings(node, shots, rng=np.random.default_rng(seed), format=format)
+
+def execute_batch(circuits: Sequence[Circuit], shots: int,
+                  workers: Optional[int] = None, seed: Optional[int] = None,
+                  engine: Text = 'auto', format: Text = 'counts',
+                  progress: Optional[Callable[[int, int], None]] = None) -> List:
+  # every circuit gets its own child seed, so results do not depend on how
+  # many workers there are or which one picks up which circuit
+  seeds = np.random.SeedSequence(seed).spawn(len(circuits))
+  descriptions = [serialization.dumps(circuit) for circuit in circuits]
+  total = len(descriptions)
+  results: List = [None] * total
+  if not workers or workers == 1:
+    for i, description in enumerate(descriptions):
+      results[i] = _run(description, shots, seeds[i], engine, format)
+      if progress is not None:
+        progress(i + 1, total)
+    return results
+  with ProcessPoolExecutor(max_workers=workers) as pool:
+    futures = {pool.submit(_run, description, shots, seeds[i], engine, format): i
+               for i, description in enumerate(descriptions)}
+    for done, future in enumerate(as_completed(futures), 1):
+      results[futures[future]] = future.result()
+      if progress is not None:
+        progress(done, total)
+  return results
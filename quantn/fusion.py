@@ -0,0 +1,94 @@
+import numpy as np
+from collections import namedtuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import quantn.gates as gates
+
+FusionReport = namedtuple('FusionReport', ['nodes_before', 'nodes_after'])
+
+_IDENTITY = np.eye(2, dtype=complex)
+
+def _is_identity(matrix: np.ndarray, atol: float) -> bool:
+  return np.allclose(matrix, _IDENTITY, rtol=0, atol=atol)
+
+def _absorb_input(operator: np.ndarray, position: int,
+                  matrix: np.ndarray) -> np.ndarray:
+  # run `matrix` before the gate on its `position`-th qubit
+  axis = operator.ndim // 2 + position
+  return np.moveaxis(np.tensordot(operator, matrix, axes=([axis], [0])), -1, axis)
+
+def _absorb_output(operator: np.ndarray, position: int,
+                   matrix: np.ndarray) -> np.ndarray:
+  # run `matrix` after the gate on its `position`-th qubit
+  return np.moveaxis(np.tensordot(matrix, operator, axes=([1], [position])), 0, position)
+
+def _flush(fused: List[Tuple], q: int, matrix: Optional[np.ndarray],
+           originals: List[Callable], atol: float) -> None:
+  if matrix is None or _is_identity(matrix, atol):
+    return
+  if len(originals) == 1:
+    fused.append((originals[0], q))
+  else:
+    fused.append((gates.unitary_gate(matrix), q))
+
+def _node_total(operations: Sequence[Tuple]) -> int:
+  # one operation can add several nodes, a cz adds its values and two COPYs
+  return sum(gates.node_count(operation[0]) for operation in operations)
+
+def fuse_gates(operations: Sequence[Tuple],
+               atol: float = 1e-12) -> Tuple[List[Tuple], FusionReport]:
+  # Runs of single qubit gates are multiplied together while they wait on
+  # their wire. The product is folded into the next two qubit gate on that
+  # wire, or into the previous one once the wire has nothing left, and is
+  # dropped entirely when it multiplies out to the identity.
+  fused: List[Tuple] = []
+  operators: Dict[int, np.ndarray] = {}
+  pending: Dict[int, np.ndarray] = {}
+  pending_gates: Dict[int, List[Callable]] = {}
+  last_two: Dict[int, int] = {}
+  for gate, *qubits in operations:
+    if (gates.is_symbolic(gate) or gates.is_channel(gate)
+        or gate.gate_name == 'controlled'):
+      # unbound gates have no matrix yet, channels no unitary at all and
+      # controlled chains would lose their compact form, flush their wires
+      # and keep them as they are
+      for q in qubits:
+        _flush(fused, q, pending.pop(q, None), pending_gates.pop(q, []), atol)
+        last_two.pop(q, None)
+      fused.append((gate,) + tuple(qubits))
+      continue
+    if len(qubits) == 1:
+      q = qubits[0]
+      pending[q] = gates.gate_operator(gate) @ pending.get(q, _IDENTITY)
+      pending_gates.setdefault(q, []).append(gate)
+      continue
+    operator = None
+    for position, q in enumerate(qubits):
+      matrix = pending.pop(q, None)
+      pending_gates.pop(q, None)
+      if matrix is None or _is_identity(matrix, atol):
+        continue
+      if operator is None:
+        operator = gates.gate_operator(gate)
+      operator = _absorb_input(operator, position, matrix)
+    index = len(fused)
+    if operator is not None:
+      operators[index] = operator
+      fused.append((gates.unitary_gate(operator),) + tuple(qubits))
+    else:
+      fused.append((gate,) + tuple(qubits))
+    for q in qubits:
+      last_two[q] = index
+  for q in sorted(pending):
+    matrix = pending[q]
+    if q in last_two and not _is_identity(matrix, atol):
+      index = last_two[q]
+      gate, *qubits = fused[index]
+      operator = operators.get(index)
+      if operator is None:
+        operator = gates.gate_operator(gate)
+      operator = _absorb_output(operator, qubits.index(q), matrix)
+      operators[index] = operator
+      fused[index] = (gates.unitary_gate(operator),) + tuple(qubits)
+    else:
+      _flush(fused, q, matrix, pending_gates[q], atol)
+  return fused, FusionReport(_node_total(operations), _node_total(fused))
@@ -1,80 +1,512 @@
+from __future__ import annotations
 from cmath import exp
-from typing import Tuple, Sequence, Callable
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 from math import sqrt, pi
-import tensornetwork as tn
+import numpy as np
 import quantn.backend as backend
+import quantn.instrument as instrument
+tn = backend.lazy_import('tensornetwork')
+
+backend.register_gate('x', [[0, 1], [1, 0]])
+backend.register_gate('y', [[0, 0-1j], [0+1j, 0]])
+backend.register_gate('z', [1, -1])
+backend.register_gate('h', [[1/sqrt(2), 1/sqrt(2)],
+                            [1/sqrt(2), -1/sqrt(2)]])
+backend.register_gate('t', [1, exp((1j * pi) / 4)])
+backend.register_gate('cx',
+                    [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]],
+                    with_shape=[2, 2, 2, 2])
+backend.register_gate('cy',
+                    [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 0-1j], [0, 0, 0+1j, 0]],
+                    with_shape=[2, 2, 2, 2])
+backend.register_gate('cz', [[1, 1], [1, -1]])
+backend.register_gate('ch',
+                    [[1, 0, 0, 0],
+                    [0, 1, 0, 0],
+                    [0, 0, 1/sqrt(2), 1/sqrt(2)],
+                    [0, 0, 1/sqrt(2), -1/sqrt(2)]],
+                    with_shape=[2, 2, 2, 2])
+
+# rotation matrices broadcast over array arguments so parameter sweeps can
+# build a whole batch of tensors in one call
+def _rx_matrix(theta) -> np.ndarray:
+    cos = np.cos(np.asarray(theta, dtype=float) / 2) + 0j
+    sin = -1j * np.sin(np.asarray(theta, dtype=float) / 2)
+    return np.stack([np.stack([cos, sin], -1), np.stack([sin, cos], -1)], -2)
+
+def _ry_matrix(theta) -> np.ndarray:
+    cos = np.cos(np.asarray(theta, dtype=float) / 2) + 0j
+    sin = np.sin(np.asarray(theta, dtype=float) / 2) + 0j
+    return np.stack([np.stack([cos, -sin], -1), np.stack([sin, cos], -1)], -2)
+
+# diagonal gates are stored as their diagonal alone, indexed by the input
+# bit of each qubit, see _diagonal_network
+def _rz_matrix(theta) -> np.ndarray:
+    phase = np.exp(0.5j * np.asarray(theta, dtype=float))
+    return np.stack([phase.conj(), phase], -1)
+
+def _phase_matrix(theta) -> np.ndarray:
+    phase = np.exp(1j * np.asarray(theta, dtype=float))
+    return np.stack([np.ones_like(phase), phase], -1)
+
+def _cphase_matrix(theta) -> np.ndarray:
+    phase = np.exp(1j * np.asarray(theta, dtype=float))
+    one = np.ones_like(phase)
+    return np.stack([np.stack([one, one], -1), np.stack([one, phase], -1)], -2)
+
+_MATRICES = {
+    'rx': _rx_matrix,
+    'ry': _ry_matrix,
+    'rz': _rz_matrix,
+    'phase': _phase_matrix,
+    'cphase': _cphase_matrix,
+}
+
+for _name, _matrix in _MATRICES.items():
+    backend.register_parameterized_gate(_name, _matrix)
+
+class Parameter:
+    # symbolic gate parameter, bound to a value when a circuit executes
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __repr__(self) -> str:
+        return 'Parameter(' + repr(self.name) + ')'
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Parameter) and other.name == self.name
+
+    def __hash__(self) -> int:
+        return hash(('Parameter', self.name))
 
 def apply_gate(state: Sequence[tn.Node], gate: Callable, *qubits: Sequence[int]) -> None: 
+    apply = getattr(state, 'apply_gate', None)
+    if apply is not None:
+        # doubled states such as noise.DensityState wire gates themselves
+        apply(gate, *qubits)
+        return
     n = len(qubits)
-    if n > 2:
-        raise ValueError("Error, may only apply gates to up to two qubits")
-    elif n == 2:
-        q_0 = qubits[0]
-        q_1 = qubits[1]
-        control, target = gate(state[q_0], state[q_1])
-        state[q_0], state[q_1] = control, target
+    if n > 1:
+        if len(set(qubits)) != n:
+            raise ValueError("Gate qubits must be distinct")
+        outputs = gate(*[state[q] for q in qubits])
+        for q, edge in zip(qubits, outputs):
+            state[q] = edge
         return
     q_0 = qubits[0]
     control = gate(state[q_0])
     state[q_0] = control
 
+# Diagonal gates never build a dense node. Each wire runs through a COPY
+# node whose third leg feeds one index of the diagonal, the planner merges
+# the COPY legs into a single hyperedge so a z gate costs an elementwise
+# multiply and a cz a rank 2 tensor. Two qubit diagonals keep the output
+# order of the other controlled gates, which hand back the wires swapped.
+_DIAGONAL = {'z', 't', 'cz', 'rz', 'phase', 'cphase', 'diagonal'}
+
+def _diagonal_network(name: str, values: np.ndarray,
+                      edges: Sequence[tn.Edge]) -> List[tn.Edge]:
+    node = tn.Node(values)
+    copies = [tn.CopyNode(3, 2, dtype=values.dtype) for _ in edges]
+    for i, (copy, edge) in enumerate(zip(copies, edges)):
+        edge ^ copy[0]
+        copy[2] ^ node[i]
+    if instrument._sinks:
+        for created in [node] + copies:
+            instrument.node_created(name, created)
+    outputs = [copy[1] for copy in copies]
+    return outputs[::-1] if name in _CONTROLLED_LAYOUT else outputs
+
+def tensor_node(edge: tn.Edge) -> tn.Node:
+    # the node holding gate_tensor for the gate that produced `edge`, the
+    # last output edge of an application
+    node = edge.node1
+    if isinstance(node, tn.CopyNode):
+        return node[2].node2
+    return node
+
 def xgate(edge: tn.Edge) -> tn.Edge:
-    gate = backend.create_node([[0, 1], [1, 0]])
+    gate = backend.create_gate_node('x')
     edge ^ gate[1]
     return gate[0]
 
 def ygate(edge: tn.Edge) -> tn.Edge:
-    gate = backend.create_node([[0, 0-1j], [0+1j, 0]])
+    gate = backend.create_gate_node('y')
     edge ^ gate[1]
     return gate[0]
 
 def zgate(edge: tn.Edge) -> tn.Edge:
-    gate = backend.create_node([[1, 0], [0, -1]])
-    edge ^ gate[1]
-    return gate[0]
+    return _diagonal_network('z', backend.gate_tensor('z'), [edge])[0]
 
 def hgate(edge: tn.Edge) -> tn.Edge:
-    gate = backend.create_node([[1/sqrt(2), 1/sqrt(2)],
-                                [1/sqrt(2), -1/sqrt(2)]])
+    gate = backend.create_gate_node('h')
     edge ^ gate[1]
     return gate[0]
 
 def tgate(edge: tn.Edge) -> tn.Edge:
-    gate = backend.create_node([[1, 0], [0, exp((1j * pi) / 4)]])
-    edge ^ gate[1]
-    return gate[0]
+    return _diagonal_network('t', backend.gate_tensor('t'), [edge])[0]
 
 def controlled_xgate(control_edge: tn.Edge,
                     target_edge: tn.Edge) -> Tuple[tn.Edge, tn.Edge]:
-    tensor = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]]
-    gate = backend.create_node(tensor, with_shape=[2, 2, 2, 2])
+    gate = backend.create_gate_node('cx')
     gate[0] ^ control_edge
     gate[3] ^ target_edge
     return gate[1], gate[2]
 
 def controlled_ygate(control_edge: tn.Edge,
                     target_edge: tn.Edge) -> Tuple[tn.Edge, tn.Edge]:
-    tensor = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 0-1j], [0, 0, 0+1j, 0]]
-    gate = backend.create_node(tensor, with_shape=[2, 2, 2, 2])
+    gate = backend.create_gate_node('cy')
     gate[0] ^ control_edge
     gate[3] ^ target_edge
     return gate[1], gate[2]
 
 def controlled_zgate(control_edge: tn.Edge,
                     target_edge: tn.Edge) -> Tuple[tn.Edge, tn.Edge]:
-    tensor = [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, -1]]
-    gate = backend.create_node(tensor, with_shape=[2, 2, 2, 2])
-    gate[0] ^ control_edge
-    gate[3] ^ target_edge
-    return gate[1], gate[2]
+    values = backend.gate_tensor('cz')
+    return _diagonal_network('cz', values, [control_edge, target_edge])
 
 def controlled_hgate(control_edge: tn.Edge,
                     target_edge: tn.Edge) -> Tuple[tn.Edge, tn.Edge]:
-    tensor = [[1, 0, 0, 0],
-            [0, 1, 0, 0],
-            [0, 0, 1/sqrt(2), 1/sqrt(2)],
-            [0, 0, 1/sqrt(2), -1/sqrt(2)]]
-    gate = backend.create_node(tensor, with_shape=[2, 2, 2, 2])
+    gate = backend.create_gate_node('ch')
     gate[0] ^ control_edge
     gate[3] ^ target_edge
     return gate[1], gate[2]
+
+def _parameterized_gate(name: str, num_qubits: int, theta) -> Callable:
+    if not isinstance(theta, Parameter):
+        theta = float(theta)
+
+    def gate(*edges: tn.Edge):
+        if isinstance(theta, Parameter):
+            raise ValueError("Parameter " + theta.name + " must be bound first")
+        if name in _DIAGONAL:
+            outputs = _diagonal_network(name, backend.gate_tensor(name, theta), edges)
+            return outputs[0] if num_qubits == 1 else tuple(outputs)
+        node = backend.create_gate_node(name, theta)
+        if num_qubits == 1:
+            edges[0] ^ node[1]
+            return node[0]
+        node[0] ^ edges[0]
+        node[3] ^ edges[1]
+        return node[1], node[2]
+
+    gate.gate_name = name
+    gate.params = (theta,)
+    gate.num_qubits = num_qubits
+    return gate
+
+def rxgate(theta: Union[float, Parameter]) -> Callable:
+    return _parameterized_gate('rx', 1, theta)
+
+def rygate(theta: Union[float, Parameter]) -> Callable:
+    return _parameterized_gate('ry', 1, theta)
+
+def rzgate(theta: Union[float, Parameter]) -> Callable:
+    return _parameterized_gate('rz', 1, theta)
+
+def phasegate(theta: Union[float, Parameter]) -> Callable:
+    return _parameterized_gate('phase', 1, theta)
+
+def controlled_phasegate(theta: Union[float, Parameter]) -> Callable:
+    return _parameterized_gate('cphase', 2, theta)
+
+PARAMETERIZED_GATES = {
+    'rx': rxgate,
+    'ry': rygate,
+    'rz': rzgate,
+    'phase': phasegate,
+    'cphase': controlled_phasegate,
+}
+
+# Noise channels are given by their Kraus operators and have no pure state
+# network of their own. quantn.noise joins the ket and bra halves of a
+# density matrix with them, or picks one operator per Monte Carlo trajectory.
+def _channel(name: str, params: Tuple, kraus: Sequence) -> Callable:
+    kraus = np.asarray(kraus, dtype=np.complex128)
+    # operators that vanish for these parameters would only ever be drawn
+    # with probability zero, so they are dropped up front
+    kraus = kraus[np.einsum('kij,kij->k', kraus.conj(), kraus).real > 0]
+    kraus.setflags(write=False)
+
+    def channel(*edges: tn.Edge):
+        raise ValueError("Noise channel " + name +
+                         " needs a quantn.noise density matrix or trajectory")
+
+    channel.gate_name = name
+    channel.params = params
+    channel.num_qubits = 1
+    channel.kraus = kraus
+    return channel
+
+def _check_probability(name: str, value: float) -> float:
+    value = float(value)
+    if not 0 <= value <= 1:
+        raise ValueError(name + " must be a probability")
+    return value
+
+def depolarizing_channel(p: float) -> Callable:
+    # rho -> (1 - p) rho + p I / 2
+    p = _check_probability('p', p)
+    paulis = [backend.gate_tensor(name) for name in ('x', 'y')]
+    paulis.append(np.diag(backend.gate_tensor('z')))
+    return _channel('depolarizing', (p,),
+                    [sqrt(1 - 3 * p / 4) * np.eye(2)] +
+                    [sqrt(p / 4) * pauli for pauli in paulis])
+
+def amplitude_damping_channel(gamma: float) -> Callable:
+    gamma = _check_probability('gamma', gamma)
+    return _channel('amplitude_damping', (gamma,),
+                    [[[1, 0], [0, sqrt(1 - gamma)]], [[0, sqrt(gamma)], [0, 0]]])
+
+def readout_error(p01: float, p10: Optional[float] = None) -> Callable:
+    # p01 is the chance of reading 1 from a 0 and p10 of reading 0 from a 1.
+    # As a channel it also removes coherences, so it belongs right before
+    # measurement.
+    p01 = _check_probability('p01', p01)
+    p10 = p01 if p10 is None else _check_probability('p10', p10)
+    return _channel('readout_error', (p01, p10),
+                    [[[sqrt(1 - p01), 0], [0, 0]], [[0, 0], [sqrt(p01), 0]],
+                     [[0, 0], [0, sqrt(1 - p10)]], [[0, sqrt(p10)], [0, 0]]])
+
+CHANNELS = {
+    'depolarizing': depolarizing_channel,
+    'amplitude_damping': amplitude_damping_channel,
+    'readout_error': readout_error,
+}
+
+def is_channel(gate: Callable) -> bool:
+    return getattr(gate, 'kraus', None) is not None
+
+def is_symbolic(gate: Callable) -> bool:
+    return any(isinstance(p, Parameter) for p in getattr(gate, 'params', ()))
+
+def bind(gate: Callable, values: Dict) -> Callable:
+    if not is_symbolic(gate):
+        return gate
+    theta = gate.params[0]
+    if theta in values:
+        value = values[theta]
+    elif theta.name in values:
+        value = values[theta.name]
+    else:
+        raise ValueError("No value given for parameter " + theta.name)
+    return PARAMETERIZED_GATES[gate.gate_name](value)
+
+def batch_tensor(gate: Callable, values: np.ndarray, dtype: Any = None) -> np.ndarray:
+    # one tensor per entry of `values`, stacked along a leading batch axis
+    tensor = _MATRICES[gate.gate_name](values)
+    return tensor.astype(backend.resolve_dtype(dtype), copy=False)
+
+GATES = {
+    'x': xgate,
+    'y': ygate,
+    'z': zgate,
+    'h': hgate,
+    't': tgate,
+    'cx': controlled_xgate,
+    'cy': controlled_ygate,
+    'cz': controlled_zgate,
+    'ch': controlled_hgate,
+}
+
+# controlled gates wire their node as (control in, control out, target out,
+# target in), everything else is already (outputs..., inputs...)
+_CONTROLLED_LAYOUT = {'cx', 'cy', 'cz', 'ch', 'cphase'}
+
+for _name, _gate in GATES.items():
+    _gate.gate_name = _name
+    _gate.params = ()
+    _gate.num_qubits = 2 if _name in _CONTROLLED_LAYOUT else 1
+
+def unitary_gate(matrix: np.ndarray) -> Callable:
+    # nodes are laid out (outputs..., inputs...) in apply_gate qubit order
+    tensor = np.asarray(matrix)
+    num_qubits = int(round(np.log2(tensor.size) / 2))
+    if tensor.size != 4 ** num_qubits:
+        raise ValueError("Unitary must be a square matrix over qubits")
+    square = tensor.reshape(2 ** num_qubits, 2 ** num_qubits)
+    if not np.any(square - np.diag(np.diag(square))):
+        return diagonal_gate(np.diag(square))
+    tensor = backend.freeze_tensor(tensor, with_shape=[2] * (2 * num_qubits),
+                                   dtype=np.complex128)
+
+    def gate(*edges: tn.Edge):
+        if len(edges) != num_qubits:
+            raise ValueError("Gate expects " + str(num_qubits) + " qubits")
+        node = tn.Node(gate_tensor(gate))
+        if instrument._sinks:
+            instrument.node_created('unitary', node)
+        for i, edge in enumerate(edges):
+            edge ^ node[num_qubits + i]
+        if num_qubits == 1:
+            return node[0]
+        return tuple(node[i] for i in range(num_qubits))
+
+    gate.gate_name = 'unitary'
+    gate.params = ()
+    gate.num_qubits = num_qubits
+    gate.tensor = tensor
+    return gate
+
+def diagonal_gate(values: np.ndarray) -> Callable:
+    # the diagonal of a unitary, indexed by the input bits in qubit order
+    values = np.asarray(values)
+    num_qubits = int(round(np.log2(values.size)))
+    if values.size != 2 ** num_qubits:
+        raise ValueError("Diagonal must have one entry per basis state")
+    tensor = backend.freeze_tensor(values, with_shape=[2] * num_qubits,
+                                   dtype=np.complex128)
+
+    def gate(*edges: tn.Edge):
+        if len(edges) != num_qubits:
+            raise ValueError("Gate expects " + str(num_qubits) + " qubits")
+        outputs = _diagonal_network('diagonal', gate_tensor(gate), edges)
+        return outputs[0] if num_qubits == 1 else tuple(outputs)
+
+    gate.gate_name = 'diagonal'
+    gate.params = ()
+    gate.num_qubits = num_qubits
+    gate.tensor = tensor
+    return gate
+
+# A gate with c controls is a bond dimension 2 chain over c + 1 nodes,
+# I (x) ... (x) I + P (x) ... (x) P (x) (U - I) with P = |1><1|, so every
+# node stays rank 4 or less however many controls are added. Nodes are
+# (out, in, bonds...) and the outputs come back in the order given.
+backend.register_gate('control_head',
+                      [[[1, 0], [0, 0]], [[0, 0], [1, 1]]])
+backend.register_gate('control_link',
+                      np.einsum('oi,lr,il->oilr', np.eye(2), np.eye(2),
+                                [[1, 0], [1, 1]]))
+
+def controlled_gate(gate: Union[Callable, np.ndarray],
+                    num_controls: int = 1) -> Callable:
+    if num_controls < 1:
+        raise ValueError("Controlled gate needs at least one control")
+    if callable(gate):
+        if getattr(gate, 'num_qubits', None) != 1:
+            raise ValueError("Only single qubit gates can be controlled")
+        matrix = gate_operator(gate, np.complex128)
+    else:
+        matrix = np.asarray(gate, dtype=np.complex128)
+        if matrix.shape != (2, 2):
+            raise ValueError("Controlled operator must be a 2x2 matrix")
+    tensor = backend.freeze_tensor(np.stack([np.eye(2), matrix - np.eye(2)], axis=-1),
+                                   dtype=np.complex128)
+
+    def controlled(*edges: tn.Edge):
+        if len(edges) != num_controls + 1:
+            raise ValueError("Gate expects " + str(num_controls + 1) + " qubits")
+        nodes = [tn.Node(backend.gate_tensor('control_head'))]
+        nodes += [tn.Node(backend.gate_tensor('control_link'))
+                  for _ in range(num_controls - 1)]
+        nodes.append(tn.Node(gate_tensor(controlled)))
+        for node, edge in zip(nodes, edges):
+            edge ^ node[1]
+            if instrument._sinks:
+                instrument.node_created('controlled', node)
+        for left, right in zip(nodes, nodes[1:]):
+            left[-1] ^ right[2]
+        return tuple(node[0] for node in nodes)
+
+    controlled.gate_name = 'controlled'
+    controlled.params = (num_controls,)
+    controlled.num_qubits = num_controls + 1
+    controlled.tensor = tensor
+    return controlled
+
+def gate_terms(gate: Callable, inputs: Sequence[str], symbol: Callable[[], str],
+               dtype: Any = None) -> Tuple[List[Tuple[np.ndarray, str]], List[str], int]:
+    # The einsum operands one application of `gate` adds to a network whose
+    # open wires carry `inputs`, matching the nodes the gate function wires
+    # up. Returns the (tensor, indices) operands, the new wire symbols and
+    # which operand holds gate_tensor.
+    name = gate.gate_name
+    tensor = gate_tensor(gate, dtype)
+    inputs = list(inputs)
+    if name in _DIAGONAL:
+        outputs = inputs[::-1] if name in _CONTROLLED_LAYOUT else inputs
+        return [(tensor, ''.join(inputs))], outputs, 0
+    outputs = [symbol() for _ in inputs]
+    if name == 'controlled':
+        bonds = [symbol() for _ in inputs[1:]]
+        operands = [(backend.gate_tensor('control_head', dtype=dtype),
+                     outputs[0] + inputs[0] + bonds[0])]
+        for k in range(1, len(inputs) - 1):
+            operands.append((backend.gate_tensor('control_link', dtype=dtype),
+                             outputs[k] + inputs[k] + bonds[k - 1] + bonds[k]))
+        operands.append((tensor, outputs[-1] + inputs[-1] + bonds[-1]))
+        return operands, outputs, len(operands) - 1
+    if name in _CONTROLLED_LAYOUT:
+        return [(tensor, inputs[0] + outputs[0] + outputs[1] + inputs[1])], outputs, 0
+    return [(tensor, ''.join(outputs) + ''.join(inputs))], outputs, 0
+
+def node_count(gate: Callable) -> int:
+    # how many network nodes one application of the gate creates
+    name = getattr(gate, 'gate_name', None)
+    if name == 'controlled':
+        return gate.num_qubits
+    if name in _DIAGONAL:
+        return gate.num_qubits + 1
+    return 1
+
+def controlled_operator(gate: Callable, dtype: Any = None) -> np.ndarray:
+    # the 2x2 operator a controlled gate applies once every control is set
+    tensor = gate_tensor(gate, dtype)
+    return tensor[:, :, 0] + tensor[:, :, 1]
+
+def describe_gate(gate: Callable) -> Tuple[str, Tuple, Any]:
+    # a picklable (name, params, tensor) triple that rebuild_gate inverts
+    name = getattr(gate, 'gate_name', None)
+    if name is None:
+        raise ValueError("Gate must be created by quantn.gates")
+    return name, tuple(gate.params), getattr(gate, 'tensor', None)
+
+def rebuild_gate(name: str, params: Tuple = (), tensor: Any = None) -> Callable:
+    if name == 'unitary':
+        return unitary_gate(tensor)
+    if name == 'diagonal':
+        return diagonal_gate(tensor)
+    if name == 'controlled':
+        tensor = np.asarray(tensor)
+        return controlled_gate(tensor[:, :, 0] + tensor[:, :, 1], int(params[0]))
+    if name in PARAMETERIZED_GATES:
+        return PARAMETERIZED_GATES[name](*params)
+    if name in CHANNELS:
+        return CHANNELS[name](*params)
+    if name in GATES:
+        return GATES[name]
+    raise ValueError("Unknown gate " + name)
+
+def gate_tensor(gate: Callable, dtype: Any = None) -> np.ndarray:
+    dtype = backend.resolve_dtype(dtype)
+    tensor = getattr(gate, 'tensor', None)
+    if tensor is not None:
+        if tensor.dtype != dtype:
+            tensor = backend.freeze_tensor(tensor, dtype=dtype)
+        return tensor
+    name = getattr(gate, 'gate_name', None)
+    if name is None:
+        raise ValueError("Gate must be created by quantn.gates")
+    if is_channel(gate):
+        raise ValueError("Noise channel " + name + " has no unitary, see quantn.noise")
+    if is_symbolic(gate):
+        raise ValueError("Gate parameters must be bound first")
+    return backend.gate_tensor(name, *gate.params, dtype=dtype)
+
+def gate_operator(gate: Callable, dtype: Any = None) -> np.ndarray:
+    if gate.gate_name == 'controlled':
+        size = 2 ** gate.num_qubits
+        dense = np.eye(size, dtype=backend.resolve_dtype(dtype))
+        dense[-2:, -2:] = controlled_operator(gate, dtype)
+        return dense.reshape((2,) * (2 * gate.num_qubits))
+    tensor = gate_tensor(gate, dtype)
+    if gate.gate_name in _DIAGONAL:
+        n = gate.num_qubits
+        dense = np.diag(tensor.ravel()).reshape((2,) * (2 * n))
+        if gate.gate_name in _CONTROLLED_LAYOUT:
+            return dense.transpose(1, 0, 2, 3)
+        return dense
+    if gate.gate_name in _CONTROLLED_LAYOUT:
+        return tensor.transpose(1, 2, 0, 3)
+    return tensor
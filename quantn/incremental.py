@@ -0,0 +1,108 @@
+from __future__ import annotations
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import quantn.backend as backend
+import quantn.gates as gates
+from quantn.circuit import Circuit
+from quantn.qubit import contract_network
+tn = backend.lazy_import('tensornetwork')
+
+def _same_operation(a: Tuple, b: Tuple) -> bool:
+  if a is b or (a[0] is b[0] and a[1:] == b[1:]):
+    return True
+  if a[1:] != b[1:]:
+    return False
+  name_a, params_a, tensor_a = gates.describe_gate(a[0])
+  name_b, params_b, tensor_b = gates.describe_gate(b[0])
+  if name_a != name_b or params_a != params_b:
+    return False
+  if tensor_a is None or tensor_b is None:
+    return tensor_a is tensor_b
+  return np.array_equal(tensor_a, tensor_b)
+
+def first_difference(old: Sequence[Tuple], new: Sequence[Tuple]) -> int:
+  for i, (a, b) in enumerate(zip(old, new)):
+    if not _same_operation(a, b):
+      return i
+  return min(len(old), len(new))
+
+class IncrementalEvaluator:
+  # Keeps the state after selected prefixes of the last circuit it saw.
+  # A new evaluation diffs the operations against that circuit, drops the
+  # checkpoints past the first change and contracts only the gates after
+  # the latest surviving one. Checkpoints are taken every `interval`
+  # operations and at the end, and the least recently used ones are
+  # dropped once they hold more than max_bytes.
+
+  def __init__(self, num_qubits: int, max_bytes: int = 2 ** 28,
+               interval: int = 16, precision: Any = None) -> None:
+    if interval < 1:
+      raise ValueError("Checkpoint interval must be positive")
+    self.num_qubits = num_qubits
+    self.max_bytes = max_bytes
+    self.interval = interval
+    self.dtype = backend.resolve_dtype(precision)
+    self.reused = 0
+    self.recomputed = 0
+    self._operations: List[Tuple] = []
+    self._checkpoints: 'OrderedDict[int, np.ndarray]' = OrderedDict()
+
+  @property
+  def nbytes(self) -> int:
+    return sum(state.nbytes for state in self._checkpoints.values())
+
+  @property
+  def checkpoints(self) -> List[int]:
+    return sorted(self._checkpoints)
+
+  def invalidate(self, start: int = 0) -> None:
+    # forget every checkpoint that includes operation `start` or later
+    for position in [p for p in self._checkpoints if p > start]:
+      del self._checkpoints[position]
+    self._operations = self._operations[:start]
+
+  def _store(self, position: int, state: np.ndarray) -> None:
+    if state.nbytes > self.max_bytes:
+      return
+    self._checkpoints[position] = state
+    self._checkpoints.move_to_end(position)
+    while self.nbytes > self.max_bytes:
+      self._checkpoints.popitem(last=False)
+
+  def _initial_state(self) -> np.ndarray:
+    state = np.zeros((2,) * self.num_qubits, dtype=self.dtype)
+    state[(0,) * self.num_qubits] = 1
+    return state
+
+  def _advance(self, state: np.ndarray, operations: Sequence[Tuple]) -> np.ndarray:
+    with backend.precision(self.dtype):
+      edges = list(tn.Node(state).edges)
+      for gate, *qubits in operations:
+        gates.apply_gate(edges, gate, *qubits)
+      state = np.asarray(contract_network(edges).tensor)
+    # checkpoints are handed out in result nodes, so they must not change
+    state.setflags(write=False)
+    return state
+
+  def evaluate(self, operations: Sequence[Tuple],
+               params: Optional[Dict] = None) -> tn.Node:
+    if isinstance(operations, Circuit):
+      operations = operations.operations
+    operations = [(gates.bind(gate, params or {}),) + tuple(qubits)
+                  for gate, *qubits in operations]
+    self.invalidate(first_difference(self._operations, operations))
+    start = max(self._checkpoints, default=0)
+    state = self._checkpoints[start] if start else self._initial_state()
+    if start:
+      self._checkpoints.move_to_end(start)
+    self.reused = start
+    self.recomputed = len(operations) - start
+    position = start
+    while position < len(operations):
+      end = min((position // self.interval + 1) * self.interval, len(operations))
+      state = self._advance(state, operations[position:end])
+      position = end
+      self._store(position, state)
+    self._operations = operations
+    return tn.Node(state)
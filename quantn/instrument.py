@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Text, TextIO, Union
+
+# Hooks in the rest of the package test `if instrument._sinks:` before doing
+# any work, so with nothing listening the cost is one list truth test.
+
+Event = namedtuple('Event', ['name', 'category', 'start', 'duration', 'args'])
+
+_sinks: List[Callable[[Event], None]] = []
+
+def enabled() -> bool:
+  return bool(_sinks)
+
+def emit(name: Text, category: Text, start: float,
+         duration: Optional[float] = None, **args: Any) -> None:
+  event = Event(name, category, start, duration, args)
+  for sink in list(_sinks):
+    sink(event)
+
+def node_created(gate_name: Text, node: Any) -> None:
+  emit('node', 'gate', time.perf_counter(), gate=gate_name, edges=len(node.edges))
+
+class _Span:
+  __slots__ = ('name', 'category', 'args', 'start')
+
+  def __init__(self, name: Text, category: Text, args: Dict) -> None:
+    self.name = name
+    self.category = category
+    self.args = args
+
+  def __enter__(self) -> '_Span':
+    self.start = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc: Any) -> None:
+    start = self.start
+    emit(self.name, self.category, start, time.perf_counter() - start, **self.args)
+
+class _NullSpan:
+  __slots__ = ()
+
+  def __enter__(self) -> '_NullSpan':
+    return self
+
+  def __exit__(self, *exc: Any) -> None:
+    pass
+
+_NULL_SPAN = _NullSpan()
+
+def span(name: Text, category: Text = 'quantn', **args: Any) -> Union[_Span, _NullSpan]:
+  if not _sinks:
+    return _NULL_SPAN
+  return _Span(name, category, args)
+
+def add_callback(callback: Callable[[Event], None]) -> None:
+  _sinks.append(callback)
+
+def remove_callback(callback: Callable[[Event], None]) -> None:
+  _sinks.remove(callback)
+
+class Recorder:
+  # Keeps every event it sees and folds the node and intermediate events
+  # into running totals, timestamps are seconds since the recorder began.
+
+  def __init__(self) -> None:
+    self.origin = time.perf_counter()
+    self.events: List[Event] = []
+    self.nodes: Counter = Counter()
+    self.edges: Counter = Counter()
+    self.intermediates: List[Dict] = []
+    self._pid = os.getpid()
+    self._tid = threading.get_ident()
+
+  def __call__(self, event: Event) -> None:
+    self.events.append(event._replace(start=event.start - self.origin))
+    if event.name == 'node':
+      self.nodes[event.args['gate']] += 1
+      self.edges[event.args['gate']] += event.args['edges']
+    elif event.name == 'intermediate':
+      self.intermediates.append(event.args)
+
+  def total(self, name: Text) -> float:
+    return sum(event.duration for event in self.events
+               if event.name == name and event.duration is not None)
+
+  def peak_intermediate(self) -> int:
+    return max((args['bytes'] for args in self.intermediates), default=0)
+
+  def chrome_trace(self) -> Dict:
+    trace = []
+    for event in self.events:
+      entry = {
+        'name': event.name,
+        'cat': event.category,
+        'ts': event.start * 1e6,
+        'pid': self._pid,
+        'tid': self._tid,
+        'args': {key: list(value) if isinstance(value, tuple) else value
+                 for key, value in event.args.items()},
+      }
+      if event.duration is None:
+        entry.update(ph='i', s='t')
+      else:
+        entry.update(ph='X', dur=event.duration * 1e6)
+      trace.append(entry)
+    return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+  def export_chrome_trace(self, file: Union[Text, TextIO]) -> None:
+    if isinstance(file, str):
+      with open(file, 'w') as handle:
+        json.dump(self.chrome_trace(), handle)
+    else:
+      json.dump(self.chrome_trace(), file)
+
+@contextmanager
+def record() -> Iterator[Recorder]:
+  recorder = Recorder()
+  _sinks.append(recorder)
+  try:
+    yield recorder
+  finally:
+    _sinks.remove(recorder)
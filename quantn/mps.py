@@ -0,0 +1,144 @@
+from __future__ import annotations
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Text, Union
+import quantn.backend as backend
+import quantn.gates as gates
+from quantn.qubit import format_bits
+tn = backend.lazy_import('tensornetwork')
+
+_SWAP = np.eye(4, dtype=complex)[[0, 2, 1, 3]].reshape(2, 2, 2, 2)
+
+class MPSSimulator:
+  # Site tensors are (left bond, physical, right bond) and kept in mixed
+  # canonical form around self._center, so the singular values dropped
+  # when splitting a two-site update are exactly the lost fidelity.
+
+  def __init__(self, num_qubits: int, max_bond: Optional[int] = None,
+               cutoff: float = 1e-12, precision: Any = None) -> None:
+    if num_qubits < 1:
+      raise ValueError("Simulator requires at least one qubit")
+    if max_bond is not None and max_bond < 1:
+      raise ValueError("Maximum bond dimension must be positive")
+    self.num_qubits = num_qubits
+    self.dtype = backend.resolve_dtype(precision)
+    self.max_bond = max_bond
+    self.cutoff = cutoff
+    self.truncation_error = 0.0
+    self._sites: List[np.ndarray] = []
+    for _ in range(num_qubits):
+      site = np.zeros((1, 2, 1), dtype=self.dtype)
+      site[0, 0, 0] = 1
+      self._sites.append(site)
+    self._center = 0
+
+  @property
+  def bond_dimensions(self) -> List[int]:
+    return [site.shape[2] for site in self._sites[:-1]]
+
+  def _move_center(self, position: int) -> None:
+    while self._center < position:
+      i = self._center
+      left, phys, right = self._sites[i].shape
+      q, r = np.linalg.qr(self._sites[i].reshape(left * phys, right))
+      self._sites[i] = q.reshape(left, phys, -1)
+      self._sites[i + 1] = np.tensordot(r, self._sites[i + 1], axes=1)
+      self._center += 1
+    while self._center > position:
+      i = self._center
+      left, phys, right = self._sites[i].shape
+      q, r = np.linalg.qr(self._sites[i].reshape(left, phys * right).T)
+      self._sites[i] = q.T.reshape(-1, phys, right)
+      self._sites[i - 1] = np.tensordot(self._sites[i - 1], r.T, axes=1)
+      self._center -= 1
+
+  def _truncate(self, singular_values: np.ndarray) -> int:
+    weights = singular_values ** 2
+    total = np.sum(weights)
+    # discarded[k] is the weight thrown away when keeping k values
+    discarded = np.concatenate([np.cumsum(weights[::-1])[::-1], [0.0]]) / total
+    keep = int(np.argmax(discarded <= self.cutoff))
+    if self.max_bond is not None:
+      keep = min(keep, self.max_bond)
+    keep = max(keep, 1)
+    self.truncation_error += float(discarded[keep])
+    return keep
+
+  def _apply_two_site(self, i: int, operator: np.ndarray) -> None:
+    self._move_center(i)
+    theta = np.einsum('lar,rbs->labs', self._sites[i], self._sites[i + 1])
+    theta = np.einsum('cdab,labs->lcds', operator, theta)
+    left, _, _, right = theta.shape
+    u, s, vh = np.linalg.svd(theta.reshape(left * 2, 2 * right),
+                             full_matrices=False)
+    keep = self._truncate(s)
+    norm = np.linalg.norm(s)
+    s = s[:keep] * (norm / np.linalg.norm(s[:keep]))
+    self._sites[i] = u[:, :keep].reshape(left, 2, keep)
+    self._sites[i + 1] = (s[:, None] * vh[:keep]).reshape(keep, 2, right)
+    self._center = i + 1
+
+  def apply_gate(self, gate: Callable, *qubits: int) -> None:
+    if len(qubits) > 2:
+      raise ValueError("Error, may only apply gates to up to two qubits")
+    if len(set(qubits)) != len(qubits):
+      raise ValueError("Gate qubits must be distinct")
+    for q in qubits:
+      if not 0 <= q < self.num_qubits:
+        raise ValueError("Qubit index out of range")
+    operator = gates.gate_operator(gate, self.dtype)
+    if len(qubits) == 1:
+      q = qubits[0]
+      self._sites[q] = np.einsum('ab,lbr->lar', operator, self._sites[q])
+      return
+    q_0, q_1 = qubits
+    if q_0 > q_1:
+      operator = operator.transpose(1, 0, 3, 2)
+      q_0, q_1 = q_1, q_0
+    # route q_1 next to q_0 through swaps, apply, then route it back
+    for i in range(q_1 - 1, q_0, -1):
+      self._apply_two_site(i, _SWAP.astype(self.dtype))
+    self._apply_two_site(q_0, operator)
+    for i in range(q_0 + 1, q_1):
+      self._apply_two_site(i, _SWAP.astype(self.dtype))
+
+  def get_tensor(self) -> np.ndarray:
+    state = self._sites[0]
+    for site in self._sites[1:]:
+      state = np.tensordot(state, site, axes=1)
+    return state.reshape((2,) * self.num_qubits)
+
+  def state(self) -> tn.Node:
+    return tn.Node(self.get_tensor())
+
+  def amplitude(self, bitstring: Text) -> complex:
+    if len(bitstring) != self.num_qubits:
+      raise ValueError("Bitstring must have one bit per qubit")
+    vector = np.ones(1, dtype=self.dtype)
+    for site, bit in zip(self._sites, bitstring):
+      vector = vector @ site[:, int(bit), :]
+    return complex(vector[0])
+
+  def sample_bitstrings(self, shots: int,
+                        rng: Optional[np.random.Generator] = None,
+                        format: Text = 'str') -> Union[List, np.ndarray, Dict]:
+    if shots < 0:
+      raise ValueError("Number of shots must be non-negative")
+    # right environments let every shot be drawn qubit by qubit from its
+    # conditional distribution without ever forming the full state
+    environments = [np.ones((1, 1), dtype=self.dtype)]
+    for site in reversed(self._sites[1:]):
+      env = np.einsum('lsr,rR,LsR->lL', site, environments[0], site.conj())
+      environments.insert(0, env)
+    bits = np.zeros((shots, self.num_qubits), dtype=np.uint8)
+    prefix = np.ones((shots, 1), dtype=self.dtype)
+    for q, (site, env) in enumerate(zip(self._sites, environments)):
+      branches = np.einsum('kl,lsr->ksr', prefix, site)
+      weights = np.einsum('ksr,rR,ksR->ks', branches, env, branches.conj()).real
+      weights = np.maximum(weights, 0)
+      weights /= np.sum(weights, axis=1, keepdims=True)
+      draws = rng.random(shots) if rng is not None else np.random.random_sample(shots)
+      outcome = (draws >= weights[:, 0]).astype(np.uint8)
+      bits[:, q] = outcome
+      chosen = branches[np.arange(shots), outcome]
+      prefix = chosen / np.sqrt(weights[np.arange(shots), outcome])[:, None]
+    return format_bits(bits, format)
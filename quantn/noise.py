@@ -0,0 +1,183 @@
+from __future__ import annotations
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Text, Tuple, Union
+import quantn.backend as backend
+import quantn.contraction as contraction
+import quantn.gates as gates
+import quantn.instrument as instrument
+import quantn.serialization as serialization
+from quantn.circuit import Circuit
+from quantn.qubit import contract_network, create_qubit, sample_from_cdf
+tn = backend.lazy_import('tensornetwork')
+
+# Two ways to run circuits holding gates.CHANNELS. The density matrix mode
+# keeps a ket and a bra copy of the network, unitaries act on both halves
+# and a channel joins them through its superoperator, which is exact at
+# twice the network width. The trajectory mode keeps a single copy and
+# draws one Kraus operator per channel per trajectory, stacking many
+# trajectories on a batch axis the way Circuit.sweep stacks parameters.
+
+MODES = ('density', 'trajectory')
+
+def superoperator(channel: Callable) -> np.ndarray:
+  # laid out (ket out, bra out, ket in, bra in)
+  kraus = channel.kraus
+  return np.einsum('kab,kcd->acbd', kraus, kraus.conj())
+
+def _conjugate(gate: Callable) -> Callable:
+  # the bra half of the network runs the complex conjugate of every gate
+  if gate.gate_name == 'controlled':
+    operator = gates.controlled_operator(gate)
+    if not np.any(operator.imag):
+      return gate
+    return gates.controlled_gate(operator.conj(), gate.num_qubits - 1)
+  operator = gates.gate_operator(gate)
+  if not np.any(operator.imag):
+    return gate
+  return gates.unitary_gate(operator.conj())
+
+class DensityState:
+  # A density matrix network, pass it to gates.apply_gate in place of a
+  # list of qubit edges. Contracting kets + bras gives rho with the ket
+  # indices first.
+
+  def __init__(self, num_qubits: int) -> None:
+    if num_qubits < 1:
+      raise ValueError("Density state requires at least one qubit")
+    self.kets = [create_qubit() for _ in range(num_qubits)]
+    self.bras = [create_qubit() for _ in range(num_qubits)]
+
+  def __len__(self) -> int:
+    return len(self.kets)
+
+  @property
+  def edges(self) -> List[tn.Edge]:
+    return self.kets + self.bras
+
+  def apply_gate(self, gate: Callable, *qubits: int) -> None:
+    if not gates.is_channel(gate):
+      gates.apply_gate(self.kets, gate, *qubits)
+      gates.apply_gate(self.bras, _conjugate(gate), *qubits)
+      return
+    if len(qubits) != 1:
+      raise ValueError("Noise channels act on a single qubit")
+    q = qubits[0]
+    node = tn.Node(superoperator(gate).astype(backend.get_dtype()))
+    if instrument._sinks:
+      instrument.node_created(gate.gate_name, node)
+    self.kets[q] ^ node[2]
+    self.bras[q] ^ node[3]
+    self.kets[q], self.bras[q] = node[0], node[1]
+
+def _density_state(circuit: Circuit, params: Optional[Dict] = None) -> DensityState:
+  state = DensityState(circuit.num_qubits)
+  for gate, *qubits in circuit.operations:
+    gates.apply_gate(state, gates.bind(gate, params or {}), *qubits)
+  return state
+
+def density_matrix(state: Union[DensityState, Circuit], params: Optional[Dict] = None,
+                   strategy: Union[Text, Callable] = 'greedy') -> tn.Node:
+  if isinstance(state, Circuit):
+    with backend.precision(state.dtype):
+      return contract_network(_density_state(state, params).edges, strategy)
+  return contract_network(state.edges, strategy)
+
+def density_probabilities(node: tn.Node) -> np.ndarray:
+  # the diagonal of rho shaped like a state, rounding can leave entries a
+  # hair below zero and those are clipped
+  n = len(node.shape) // 2
+  rho = np.reshape(node.tensor, (2 ** n, 2 ** n))
+  return np.maximum(np.diagonal(rho).real, 0).reshape((2,) * n)
+
+def _trajectory_terms(gate: Callable, inputs: Sequence[str], symbol: Callable[[], str],
+                      dtype: Any = None) -> Tuple[List[Tuple[np.ndarray, str]], List[str], int]:
+  # channels become a 2x2 operand that each trajectory fills in
+  if gates.is_channel(gate):
+    output = symbol()
+    placeholder = gate.kraus[0].astype(backend.resolve_dtype(dtype))
+    return [(placeholder, output + inputs[0])], [output], 0
+  return gates.gate_terms(gate, inputs, symbol, dtype)
+
+def _unravel(channel: Callable) -> Tuple[np.ndarray, np.ndarray]:
+  # operator k is drawn with the fixed probability q_k = tr(K_k^dag K_k) / 2
+  # and applied as K_k / sqrt(q_k), so averaging |psi><psi| over trajectories
+  # gives the channel exactly without looking at the state
+  kraus = channel.kraus
+  weights = np.einsum('kij,kij->k', kraus.conj(), kraus).real / 2
+  return weights / np.sum(weights), kraus / np.sqrt(weights)[:, None, None]
+
+def _run_trajectories(data: bytes, batches: Sequence[Tuple[int, np.random.SeedSequence]]
+                      ) -> np.ndarray:
+  # summed |amplitude|**2 over every trajectory in `batches`
+  circuit = serialization.loads(data)
+  spec, tensors, gate_nodes = circuit._network(_trajectory_terms)
+  channels = [(index, _unravel(operation[0]))
+              for index, operation in zip(gate_nodes, circuit.operations)
+              if gates.is_channel(operation[0])]
+  total = np.zeros((2,) * circuit.num_qubits)
+  if not channels:
+    state = contraction.contract(spec, tensors, contraction.find_path(spec))
+    return total + sum(count for count, _ in batches) * np.square(np.abs(state))
+  batch = contraction.oe.get_symbol(len(spec.size_dict))
+  inputs = list(spec.inputs)
+  for index, _ in channels:
+    inputs[index] = batch + inputs[index]
+  paths: Dict[int, Tuple] = {}
+  for count, seed in batches:
+    if count not in paths:
+      size_dict = dict(spec.size_dict)
+      size_dict[batch] = count
+      batched = contraction.NetworkSpec(None, inputs, batch + spec.output, size_dict)
+      paths[count] = (batched, contraction.find_path(batched))
+    batched, path = paths[count]
+    rng = np.random.default_rng(seed)
+    batch_tensors = list(tensors)
+    for index, (weights, operators) in channels:
+      picks = rng.choice(len(weights), size=count, p=weights)
+      batch_tensors[index] = operators[picks].astype(circuit.dtype, copy=False)
+    states = contraction.contract(batched, batch_tensors, path)
+    total += np.sum(np.square(np.abs(states), dtype=np.float64), axis=0)
+  return total
+
+def trajectory_probabilities(circuit: Circuit, trajectories: int,
+                             params: Optional[Dict] = None, batch_size: int = 64,
+                             workers: Optional[int] = None,
+                             seed: Optional[int] = None) -> np.ndarray:
+  if trajectories < 1 or batch_size < 1:
+    raise ValueError("Trajectories and batch size must be positive")
+  bound = Circuit(circuit.num_qubits, circuit.dtype)
+  for gate, *qubits in circuit.operations:
+    bound.apply_gate(gates.bind(gate, params or {}), *qubits)
+  data = serialization.dumps(bound)
+  # every batch gets its own child seed, so the estimate does not depend on
+  # how many workers there are or which one runs which batch
+  counts = [min(batch_size, trajectories - start)
+            for start in range(0, trajectories, batch_size)]
+  batches = list(zip(counts, np.random.SeedSequence(seed).spawn(len(counts))))
+  if not workers or workers == 1:
+    return _run_trajectories(data, batches) / trajectories
+  groups = [batches[i::workers] for i in range(min(workers, len(batches)))]
+  with ProcessPoolExecutor(max_workers=len(groups)) as pool:
+    totals = list(pool.map(_run_trajectories, [data] * len(groups), groups))
+  return np.sum(totals, axis=0) / trajectories
+
+def noisy_probabilities(circuit: Circuit, mode: Text = 'density',
+                        params: Optional[Dict] = None, trajectories: int = 1024,
+                        batch_size: int = 64, workers: Optional[int] = None,
+                        seed: Optional[int] = None,
+                        strategy: Union[Text, Callable] = 'greedy') -> np.ndarray:
+  if mode == 'density':
+    return density_probabilities(density_matrix(circuit, params, strategy))
+  if mode == 'trajectory':
+    return trajectory_probabilities(circuit, trajectories, params, batch_size,
+                                    workers, seed)
+  raise ValueError("Noise mode must be one of " + ', '.join(MODES))
+
+def sample_noisy(circuit: Circuit, shots: int, mode: Text = 'density',
+                 rng: Optional[np.random.Generator] = None, format: Text = 'str',
+                 **options: Any) -> Union[List, np.ndarray, Dict]:
+  # options are passed on to noisy_probabilities
+  probabilities = noisy_probabilities(circuit, mode, **options)
+  cdf = np.cumsum(probabilities.ravel())
+  return sample_from_cdf(cdf, probabilities.shape, shots, rng, format)
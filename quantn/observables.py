@@ -0,0 +1,106 @@
+from __future__ import annotations
+import time
+import numpy as np
+from typing import Callable, Dict, List, Sequence, Text, Tuple, Union
+from quantn.backend import lazy_import
+import quantn.contraction as contraction
+import quantn.gates as gates
+import quantn.instrument as instrument
+tn = lazy_import('tensornetwork')
+
+# Pauli operators are taken from the gate tensors so every engine agrees
+# on their phase conventions
+PAULIS = {
+  'X': gates.xgate,
+  'Y': gates.ygate,
+  'Z': gates.zgate,
+}
+
+def pauli_terms(observable: Union[Text, Dict[Text, complex]],
+                num_qubits: int) -> List[Tuple[complex, Text]]:
+  # a single Pauli string, or a dict of weighted strings like {'ZZI': 0.5},
+  # one character per output edge
+  if isinstance(observable, str):
+    observable = {observable: 1.0}
+  terms = []
+  for string, coefficient in observable.items():
+    string = string.upper()
+    if len(string) != num_qubits:
+      raise ValueError("Pauli string must have one character per output edge")
+    if any(c not in 'IXYZ' for c in string):
+      raise ValueError("Pauli strings may only contain I, X, Y and Z")
+    terms.append((coefficient, string))
+  return terms
+
+def _sandwich(spec: contraction.NetworkSpec) -> contraction.NetworkSpec:
+  # |psi>, then <psi| with every index renamed, then one 2x2 operator per
+  # output qubit joining the bra output to the ket output. Every term fills
+  # those operators in differently, identities off its support, so all of
+  # them share this structure, its path and contract to a scalar.
+  offset = len(spec.size_dict)
+  bra = {s: contraction.oe.get_symbol(offset + i) for i, s in enumerate(spec.size_dict)}
+  inputs = spec.inputs + [''.join(bra[s] for s in term) for term in spec.inputs]
+  inputs += [bra[s] + s for s in spec.output]
+  size_dict = dict(spec.size_dict)
+  for symbol, renamed in bra.items():
+    size_dict[renamed] = spec.size_dict[symbol]
+  return contraction.NetworkSpec(None, inputs, '', size_dict)
+
+def _contract_cached(sandwich: contraction.NetworkSpec, tensors: Sequence,
+                     keys: Sequence, path: Sequence[Tuple[int, ...]],
+                     cache: Dict) -> complex:
+  # An intermediate is named by the operands it holds, ket and bra tensors
+  # by position and operators by (qubit, letter). Terms run the same path,
+  # so every intermediate not involving a differing operator, the ket and
+  # bra sub-networks above all, is contracted once and reused.
+  terms = list(sandwich.inputs)
+  entries = [(frozenset([key]), tensor) for key, tensor in zip(keys, tensors)]
+  for step in path:
+    picked = [(terms[i],) + entries[i] for i in step]
+    for i in sorted(step, reverse=True):
+      del terms[i]
+      del entries[i]
+    key = frozenset().union(*[k for _, k, _ in picked])
+    if key not in cache:
+      start = time.perf_counter()
+      keep = set().union(*terms)
+      term = ''.join(dict.fromkeys(s for t, _, _ in picked for s in t if s in keep))
+      equation = ','.join(t for t, _, _ in picked) + '->' + term
+      tensor = contraction.oe.contract(equation, *[t for _, _, t in picked])
+      cache[key] = (term, tensor)
+      if instrument._sinks:
+        instrument.emit('intermediate', 'contract', start, time.perf_counter() - start,
+                        shape=tuple(tensor.shape), bytes=int(tensor.nbytes))
+    term, tensor = cache[key]
+    terms.append(term)
+    entries.append((key, tensor))
+  (term,), ((_, tensor),) = terms, entries
+  return complex(contraction.oe.contract(term + '->', tensor))
+
+def expectation(edges: Sequence[tn.Edge],
+                observable: Union[Text, Dict[Text, complex]],
+                strategy: Union[Text, Callable] = 'greedy') -> Union[float, complex]:
+  # Each Pauli string is the scalar <psi|P|psi>, divided by <psi|psi> which
+  # is the all identity term. The network itself is left untouched.
+  spec = contraction.network_spec(edges)
+  terms = pauli_terms(observable, len(edges))
+  sandwich = _sandwich(spec)
+  path = contraction.find_path(sandwich, strategy)
+  states = [node.tensor for node in spec.nodes]
+  dtype = np.result_type(*states)
+  matrices = {'I': np.eye(2, dtype=dtype)}
+  for name, gate in PAULIS.items():
+    matrices[name] = gates.gate_operator(gate, dtype)
+  tensors = states + [t.conj() for t in states]
+  keys = [('ket', i) for i in range(len(states))] + [('bra', i) for i in range(len(states))]
+  cache: Dict = {}
+  def evaluate(string: Text) -> complex:
+    return _contract_cached(sandwich, tensors + [matrices[c] for c in string],
+                            keys + list(enumerate(string)), path, cache)
+  norm = evaluate('I' * len(edges))
+  total = 0j
+  for coefficient, string in terms:
+    total += coefficient * evaluate(string) / norm
+  if all(np.isreal(coefficient) for coefficient, _ in terms):
+    return float(total.real)
+  return total
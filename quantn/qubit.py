@@ -1,18 +1,47 @@
+from __future__ import annotations
 import random
 import numpy as np
-from typing import Optional, Text, Union, Sequence, Tuple
-import tensornetwork as tn
-import tensornetwork.contractors as cn
+from typing import Callable, Dict, List, Optional, Text, Union, Sequence, Tuple
+import quantn.backend as backend
+import quantn.contraction as contraction
+import quantn.instrument as instrument
+tn = backend.lazy_import('tensornetwork')
 
 def create_qubit() -> tn.Edge:
-  tensor = tn.Node(np.array([1, 0], dtype=complex))
+  tensor = tn.Node(np.array([1, 0], dtype=backend.get_dtype()))
+  if instrument._sinks:
+    instrument.node_created('qubit', tensor)
   return tensor[0]
 
-def contract_network(edges: Sequence[tn.Edge]) -> tn.Node:
-  network = set()    
-  for edge in edges:
-    network |= tn.reachable(edge)
-  return cn.greedy(network, output_edge_order=edges)
+def contract_network(edges: Sequence[tn.Edge],
+                     strategy: Union[Text, Callable] = 'greedy',
+                     memory_limit: Optional[int] = None,
+                     workers: Optional[int] = None) -> tn.Node:
+  with instrument.span('network_spec', 'plan'):
+    spec = contraction.network_spec(edges)
+  if memory_limit is not None:
+    itemsize = max(node.tensor.dtype.itemsize for node in spec.nodes)
+    with instrument.span('choose_slices', 'plan'):
+      symbols = contraction.choose_slices(spec, memory_limit, itemsize, strategy)
+    if symbols:
+      # slices are contracted from copies of the tensors, so the network
+      # itself is left untouched and the result is a fresh node
+      with instrument.span('contract', 'contract', slices=len(symbols)):
+        state = contraction.contract_sliced(spec, symbols, strategy, workers)
+      return tn.Node(state)
+  with instrument.span('find_path', 'plan', nodes=len(spec.nodes)):
+    path = contraction.find_path(spec, strategy)
+  with instrument.span('contract', 'contract', steps=len(path)):
+    if contraction.has_hyperedges(spec):
+      # like slicing, the result is a fresh node and the network is kept
+      tensors = [node.tensor for node in spec.nodes]
+      return tn.Node(contraction.contract(spec, tensors, path))
+    return contraction.contract_nodes(path, spec.nodes, edges)
+
+def estimate_contraction(edges: Sequence[tn.Edge],
+                         strategy: Union[Text, Callable] = 'greedy'
+                         ) -> contraction.ContractionEstimate:
+  return contraction.estimate(contraction.network_spec(edges), strategy)
 
 def eval_probability(node: tn.Node, normalize: bool = False) -> np.ndarray:
   if not isinstance(node, tn.Node):
@@ -22,19 +51,126 @@ def eval_probability(node: tn.Node, normalize: bool = False) -> np.ndarray:
       probability amplitude")
   state = node.get_tensor()
   if normalize:
-    state = np.abs(state) ** 2
+    # square and accumulate in double precision whatever the state dtype,
+    # single precision sums drift visibly over 2**n terms
+    state = np.square(np.abs(state), dtype=np.float64)
     state /= np.sum(state)
   return state.ravel()
 
-def take_bitstring(node: Union[tn.Edge, tn.Node]) -> Text:
+def _bitstring_array(bitstrings: Union[Sequence[Text], np.ndarray],
+                     num_qubits: int) -> np.ndarray:
+  if isinstance(bitstrings, np.ndarray) and bitstrings.dtype.kind in 'uib':
+    bits = np.atleast_2d(bitstrings).astype(np.intp)
+  else:
+    bits = np.array([[int(bit) for bit in bitstring] for bitstring in bitstrings],
+                    dtype=np.intp).reshape(-1, num_qubits)
+  if bits.shape[1] != num_qubits:
+    raise ValueError("Bitstrings must have one bit per output edge")
+  if not ((bits == 0) | (bits == 1)).all():
+    raise ValueError("Bitstrings may only contain 0 and 1")
+  return bits
+
+def amplitudes(edges: Sequence[tn.Edge],
+               bitstrings: Union[Sequence[Text], np.ndarray],
+               strategy: Union[Text, Callable] = 'greedy',
+               batch_size: Optional[int] = None) -> np.ndarray:
+  spec = contraction.network_spec(edges)
+  bits = _bitstring_array(bitstrings, len(edges))
+  if batch_size is None:
+    batch_size = max(len(bits), 1)
+  # every output edge is closed by a stack of basis vectors sharing one
+  # batch index, so the gate part of the network is contracted once for
+  # the whole batch instead of once per bitstring. The path is planned
+  # with a token batch size, path finders handle a large hyperedge badly.
+  batch = contraction.oe.get_symbol(len(spec.size_dict))
+  inputs = spec.inputs + [batch + symbol for symbol in spec.output]
+  size_dict = dict(spec.size_dict)
+  size_dict[batch] = 2
+  closed = contraction.NetworkSpec(None, inputs, batch, size_dict)
+  path = contraction.find_path(closed, strategy)
+  tensors = [node.tensor for node in spec.nodes]
+  dtype = np.result_type(*tensors)
+  results = []
+  for start in range(0, len(bits), batch_size):
+    chunk = bits[start:start + batch_size]
+    basis = []
+    for q, symbol in enumerate(spec.output):
+      vectors = np.zeros((len(chunk), spec.size_dict[symbol]), dtype=dtype)
+      vectors[np.arange(len(chunk)), chunk[:, q]] = 1
+      basis.append(vectors)
+    results.append(contraction.contract(closed, tensors + basis, path))
+  if not results:
+    return np.zeros(0, dtype=dtype)
+  return np.concatenate(results)
+
+def amplitude(edges: Sequence[tn.Edge], bitstring: Text,
+              strategy: Union[Text, Callable] = 'greedy') -> complex:
+  return complex(amplitudes(edges, [bitstring], strategy)[0])
+
+def _check_contracted(node: Union[tn.Edge, tn.Node]) -> None:
   if not isinstance(node, tn.Node):
     raise ValueError("Node must be of tensornetwork.Node type")
   elif len(node.get_all_nondangling()) != 0:
     raise ValueError("Tensor network must be contracted before taking \
       bitstring")
+
+def take_bitstring(node: Union[tn.Edge, tn.Node], shots: Optional[int] = None,
+                   rng: Optional[np.random.Generator] = None,
+                   format: Text = 'str') -> Union[Text, List, np.ndarray, Dict]:
+  if shots is not None:
+    return sample_bitstrings(node, shots, rng=rng, format=format)
+  _check_contracted(node)
   state_vector = eval_probability(node, normalize=True)
   indices = [i for i in range(len(state_vector))]
   linear_index = np.random.choice(indices, p=state_vector)
   random_index = np.unravel_index(linear_index, node.shape)
   bitstring = ''.join(str(bit) for bit in random_index)
   return bitstring
+
+def sample_bitstrings(node: tn.Node, shots: int,
+                      rng: Optional[np.random.Generator] = None,
+                      format: Text = 'str') -> Union[List, np.ndarray, Dict]:
+  _check_contracted(node)
+  cdf = np.cumsum(eval_probability(node, normalize=True))
+  return sample_from_cdf(cdf, node.shape, shots, rng, format)
+
+def sample_from_cdf(cdf: np.ndarray, shape: Tuple[int, ...], shots: int,
+                    rng: Optional[np.random.Generator] = None,
+                    format: Text = 'str') -> Union[List, np.ndarray, Dict]:
+  # cdf may be any array-like supporting searchsorted, np.memmap included
+  return _format_samples(_sample_indices(cdf, shots, rng), shape, format)
+
+def _sample_indices(cdf: np.ndarray, shots: int,
+                    rng: Optional[np.random.Generator]) -> np.ndarray:
+  if shots < 0:
+    raise ValueError("Number of shots must be non-negative")
+  draws = rng.random(shots) if rng is not None else np.random.random_sample(shots)
+  # scale by the last entry so rounding in the cumulative sum never leaves
+  # a draw past the end of the distribution
+  indices = np.searchsorted(cdf, draws * cdf[-1], side='right')
+  return np.minimum(indices, len(cdf) - 1)
+
+def _format_samples(indices: np.ndarray, shape: Tuple[int, ...],
+                    format: Text) -> Union[List, np.ndarray, Dict]:
+  counts = None
+  if format == 'counts':
+    indices, counts = np.unique(indices, return_counts=True)
+  bits = np.stack(np.unravel_index(indices, shape), axis=-1).astype(np.uint8)
+  return format_bits(bits, format, counts)
+
+def format_bits(bits: np.ndarray, format: Text = 'str',
+                counts: Optional[np.ndarray] = None) -> Union[List, np.ndarray, Dict]:
+  if format == 'counts' and counts is None:
+    bits, counts = np.unique(bits, axis=0, return_counts=True)
+  if format == 'bits':
+    return bits
+  elif format == 'packed':
+    return np.packbits(bits, axis=-1)
+  bits = np.ascontiguousarray(bits, dtype=np.uint8).reshape(len(bits), bits.shape[-1])
+  digits = (bits + ord('0')).view('S' + str(bits.shape[1])).ravel()
+  bitstrings = digits.astype(str).tolist()
+  if format == 'str':
+    return bitstrings
+  elif format == 'counts':
+    return dict(zip(bitstrings, counts.tolist()))
+  raise ValueError("Unknown sample format " + str(format))
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import struct
+import numpy as np
+from typing import BinaryIO, Dict, List, Optional, Sequence, Text, Tuple, Union
+import quantn.gates as gates
+from quantn.circuit import Circuit
+
+# Layout, all little endian:
+#   header   magic, version, num_qubits, precision, operation count and
+#            the lengths of the arrays that follow
+#   opcodes  uint8 per operation, see OPCODES
+#   arity    uint8 per operation
+#   qubits   uint32, concatenated over operations
+#   params   float64, concatenated over operations
+#   symbols  int32 per param, index into the name table or -1 if numeric
+#   tensors  complex128, concatenated operators of unitary gates
+#   names    utf-8 parameter names separated by NUL
+
+MAGIC = b'QTN'
+VERSION = 3
+
+OPCODES = {
+  'x': 1, 'y': 2, 'z': 3, 'h': 4, 't': 5,
+  'cx': 6, 'cy': 7, 'cz': 8, 'ch': 9,
+  'rx': 10, 'ry': 11, 'rz': 12, 'phase': 13, 'cphase': 14,
+  'unitary': 15, 'controlled': 16, 'diagonal': 17,
+  'depolarizing': 18, 'amplitude_damping': 19, 'readout_error': 20,
+}
+GATE_NAMES = {code: name for name, code in OPCODES.items()}
+
+# numeric parameters stored per operation, gates not listed take none
+PARAM_COUNTS = dict.fromkeys(list(gates.PARAMETERIZED_GATES) + list(gates.CHANNELS)
+                             + ['controlled'], 1)
+PARAM_COUNTS['readout_error'] = 2
+
+PRECISION_CODES = {None: 0, 'complex64': 1, 'complex128': 2}
+PRECISION_NAMES = {code: name for name, code in PRECISION_CODES.items()}
+
+_HEADER = struct.Struct('<3sBIBIIIII')
+
+def dumps(circuit: Circuit) -> bytes:
+  num_qubits, precision, operations = circuit.describe()
+  opcodes, arity, qubits, params, symbols, tensors = [], [], [], [], [], []
+  names: List[Text] = []
+  for name, gate_params, tensor, targets in operations:
+    if name not in OPCODES:
+      raise ValueError("Gate " + name + " has no opcode")
+    opcodes.append(OPCODES[name])
+    arity.append(len(targets))
+    qubits.extend(targets)
+    for param in gate_params:
+      if isinstance(param, gates.Parameter):
+        if param.name not in names:
+          names.append(param.name)
+        params.append(np.nan)
+        symbols.append(names.index(param.name))
+      else:
+        params.append(param)
+        symbols.append(-1)
+    if tensor is not None:
+      tensors.append(np.asarray(tensor, dtype=np.complex128).ravel())
+  tensor_data = np.concatenate(tensors) if tensors else np.zeros(0, np.complex128)
+  name_data = '\0'.join(names).encode('utf-8')
+  header = _HEADER.pack(MAGIC, VERSION, num_qubits, PRECISION_CODES[precision],
+                        len(opcodes), len(qubits), len(params),
+                        tensor_data.size, len(name_data))
+  return b''.join([
+    header,
+    np.asarray(opcodes, dtype='<u1').tobytes(),
+    np.asarray(arity, dtype='<u1').tobytes(),
+    np.asarray(qubits, dtype='<u4').tobytes(),
+    np.asarray(params, dtype='<f8').tobytes(),
+    np.asarray(symbols, dtype='<i4').tobytes(),
+    tensor_data.astype('<c16').tobytes(),
+    name_data,
+  ])
+
+def loads(data: bytes) -> Circuit:
+  (magic, version, num_qubits, precision, num_operations, num_qubit_entries,
+   num_params, num_tensor_entries, name_bytes) = _HEADER.unpack_from(data)
+  if magic != MAGIC or version != VERSION:
+    raise ValueError("Not a serialized quantn circuit")
+  offset = _HEADER.size
+  def take(dtype: Text, count: int) -> np.ndarray:
+    nonlocal offset
+    array = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+    offset += array.nbytes
+    return array
+  opcodes = take('<u1', num_operations)
+  arity = take('<u1', num_operations)
+  qubits = take('<u4', num_qubit_entries).tolist()
+  params = take('<f8', num_params).tolist()
+  symbols = take('<i4', num_params).tolist()
+  tensor_data = take('<c16', num_tensor_entries)
+  names = data[offset:offset + name_bytes].decode('utf-8').split('\0')
+  circuit = Circuit(num_qubits, PRECISION_NAMES[precision])
+  q_index = p_index = t_index = 0
+  for opcode, k in zip(opcodes.tolist(), arity.tolist()):
+    name = GATE_NAMES[opcode]
+    targets = qubits[q_index:q_index + k]
+    q_index += k
+    count = PARAM_COUNTS.get(name, 0)
+    gate_params = tuple(gates.Parameter(names[symbol]) if symbol >= 0 else value
+                        for symbol, value in zip(symbols[p_index:p_index + count],
+                                                 params[p_index:p_index + count]))
+    p_index += count
+    tensor = None
+    if name == 'unitary':
+      size = 4 ** k
+      tensor = tensor_data[t_index:t_index + size].reshape((2,) * (2 * k))
+      t_index += size
+    elif name == 'controlled':
+      # the (out, in, bond) target node, the controls are implied by arity
+      tensor = tensor_data[t_index:t_index + 8].reshape(2, 2, 2)
+      t_index += 8
+    elif name == 'diagonal':
+      tensor = tensor_data[t_index:t_index + 2 ** k].reshape((2,) * k)
+      t_index += 2 ** k
+    circuit.apply_gate(gates.rebuild_gate(name, gate_params, tensor), *targets)
+  return circuit
+
+def dump(circuit: Circuit, file: Union[Text, BinaryIO]) -> None:
+  data = dumps(circuit)
+  if isinstance(file, str):
+    with open(file, 'wb') as handle:
+      handle.write(data)
+  else:
+    file.write(data)
+
+def load(file: Union[Text, BinaryIO]) -> Circuit:
+  if isinstance(file, str):
+    with open(file, 'rb') as handle:
+      return loads(handle.read())
+  return loads(file.read())
+
+def circuit_hash(circuit: Circuit, params: Optional[Dict] = None) -> Text:
+  digest = hashlib.sha256(dumps(circuit))
+  # precision None follows the global setting, so the dtype it resolves to
+  # now is part of the key
+  digest.update(str(circuit.dtype).encode('utf-8'))
+  for key, value in sorted((getattr(k, 'name', k), float(v))
+                           for k, v in (params or {}).items()):
+    digest.update(struct.pack('<d', value) + key.encode('utf-8'))
+  return digest.hexdigest()
+
+class CircuitCache:
+  # Content addressed store of contraction paths and final states. Entries
+  # are files named after the circuit hash, reads refresh their mtime and
+  # the oldest files are evicted once the directory outgrows max_bytes.
+
+  def __init__(self, directory: Text, max_bytes: int = 2 ** 30) -> None:
+    os.makedirs(directory, exist_ok=True)
+    self.directory = directory
+    self.max_bytes = max_bytes
+    self.hits = 0
+    self.misses = 0
+
+  def _file(self, key: Text, kind: Text) -> Text:
+    return os.path.join(self.directory, key + '.' + kind + '.npy')
+
+  def _get(self, key: Text, kind: Text) -> Optional[np.ndarray]:
+    filename = self._file(key, kind)
+    try:
+      value = np.load(filename)
+    except (OSError, ValueError):
+      self.misses += 1
+      return None
+    os.utime(filename)
+    self.hits += 1
+    return value
+
+  def _put(self, key: Text, kind: Text, value: np.ndarray) -> None:
+    filename = self._file(key, kind)
+    partial = filename + '.tmp.npy'
+    np.save(partial, value)
+    os.replace(partial, filename)
+    self.evict()
+
+  def evict(self) -> None:
+    entries = []
+    for entry in os.scandir(self.directory):
+      if entry.is_file() and entry.name.endswith('.npy'):
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+      if total <= self.max_bytes:
+        break
+      os.remove(path)
+      total -= size
+
+  def size(self) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(self.directory)
+               if entry.is_file())
+
+  def get_path(self, circuit: Circuit) -> Optional[List[Tuple[int, ...]]]:
+    value = self._get(circuit_hash(circuit), 'path')
+    if value is None:
+      return None
+    return [tuple(int(i) for i in step if i >= 0) for step in value]
+
+  def put_path(self, circuit: Circuit, path: Sequence[Tuple[int, ...]]) -> None:
+    # single operand steps are padded with -1 to keep the array rectangular
+    value = np.array([tuple(step) + (-1,) * (2 - len(step)) for step in path],
+                     dtype=np.int64).reshape(-1, 2)
+    self._put(circuit_hash(circuit), 'path', value)
+
+  def get_state(self, circuit: Circuit,
+                params: Optional[Dict] = None) -> Optional[np.ndarray]:
+    return self._get(circuit_hash(circuit, params), 'state')
+
+  def put_state(self, circuit: Circuit, state: np.ndarray,
+                params: Optional[Dict] = None) -> None:
+    self._put(circuit_hash(circuit, params), 'state', state)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import quantn.backend as backend
+import quantn.gates as gates
+from quantn.mps import MPSSimulator
+from quantn.qubit import create_qubit, contract_network
+tn = backend.lazy_import('tensornetwork')
+
+# Above this many qubits a dense state vector no longer fits comfortably in
+# memory, and very shallow wide circuits contract cheaper as a network.
+MAX_STATEVECTOR_QUBITS = 25
+SHALLOW_DEPTH = 2
+SHALLOW_MIN_QUBITS = 20
+
+Operation = Tuple  # (gate, *qubits), as passed to apply_gate
+
+class StateVectorSimulator:
+  def __init__(self, num_qubits: int, precision: Any = None) -> None:
+    if num_qubits < 1:
+      raise ValueError("Simulator requires at least one qubit")
+    self.num_qubits = num_qubits
+    self.dtype = backend.resolve_dtype(precision)
+    self._state = np.zeros((2,) * num_qubits, dtype=self.dtype)
+    self._state[(0,) * num_qubits] = 1
+    self._buffer = np.empty_like(self._state)
+    self._sublists: Dict[Tuple[int, ...], Tuple[List, List]] = {}
+
+  def _sublist(self, qubits: Tuple[int, ...]) -> Tuple[List, List]:
+    sublist = self._sublists.get(qubits)
+    if sublist is None:
+      n = self.num_qubits
+      outputs = list(range(n, n + len(qubits)))
+      result = list(range(n))
+      for q, out in zip(qubits, outputs):
+        result[q] = out
+      sublist = (outputs + list(qubits), result)
+      self._sublists[qubits] = sublist
+    return sublist
+
+  def apply_gate(self, gate: Callable, *qubits: int) -> None:
+    if len(qubits) != getattr(gate, 'num_qubits', len(qubits)):
+      raise ValueError("Gate expects " + str(gate.num_qubits) + " qubits")
+    if len(set(qubits)) != len(qubits):
+      raise ValueError("Gate qubits must be distinct")
+    for q in qubits:
+      if not 0 <= q < self.num_qubits:
+        raise ValueError("Qubit index out of range")
+    if gate.gate_name == 'controlled':
+      self._apply_controlled(gate, qubits[:-1], qubits[-1])
+      return
+    operator = gates.gate_operator(gate, self.dtype)
+    gate_sublist, result_sublist = self._sublist(tuple(qubits))
+    np.einsum(operator, gate_sublist,
+              self._state, list(range(self.num_qubits)),
+              result_sublist, out=self._buffer)
+    self._state, self._buffer = self._buffer, self._state
+
+  def _apply_controlled(self, gate: Callable, controls: Tuple[int, ...],
+                        target: int) -> None:
+    # only the slice with every control set changes, so it is updated in
+    # place instead of contracting a dense 2**(2k) operator
+    index = [slice(None)] * self.num_qubits
+    for q in controls:
+      index[q] = 1
+    block = self._state[tuple(index)]
+    axis = target - sum(1 for q in controls if q < target)
+    operator = gates.controlled_operator(gate, self.dtype)
+    block[...] = np.moveaxis(np.tensordot(operator, block, axes=([1], [axis])), 0, axis)
+
+  def get_tensor(self) -> np.ndarray:
+    return self._state.copy()
+
+  def state(self) -> tn.Node:
+    return tn.Node(self.get_tensor())
+
+def circuit_depth(num_qubits: int, operations: Sequence[Operation]) -> int:
+  layers = [0] * num_qubits
+  for operation in operations:
+    qubits = operation[1:]
+    if not qubits:
+      raise ValueError("Operation must act on at least one qubit")
+    layer = max(layers[q] for q in qubits) + 1
+    for q in qubits:
+      layers[q] = layer
+  return max(layers, default=0)
+
+def choose_engine(num_qubits: int, depth: int) -> str:
+  if num_qubits > MAX_STATEVECTOR_QUBITS:
+    return 'tensornetwork'
+  if num_qubits >= SHALLOW_MIN_QUBITS and depth <= SHALLOW_DEPTH:
+    return 'tensornetwork'
+  return 'statevector'
+
+def simulate(num_qubits: int, operations: Sequence[Operation],
+             engine: str = 'auto', precision: Any = None,
+             max_bond: Optional[int] = None, cutoff: float = 1e-12) -> tn.Node:
+  # max_bond and cutoff configure the mps engine, asking for a bond limit
+  # under 'auto' picks it, since only the mps engine can truncate
+  if engine == 'auto':
+    if max_bond is not None:
+      engine = 'mps'
+    else:
+      engine = choose_engine(num_qubits, circuit_depth(num_qubits, operations))
+  if max_bond is not None and engine != 'mps':
+    raise ValueError("Only the mps engine takes a maximum bond dimension")
+  if engine == 'statevector':
+    simulator = StateVectorSimulator(num_qubits, precision)
+    for operation in operations:
+      simulator.apply_gate(*operation)
+    return simulator.state()
+  elif engine == 'mps':
+    simulator = MPSSimulator(num_qubits, max_bond, cutoff, precision)
+    for operation in operations:
+      simulator.apply_gate(*operation)
+    return simulator.state()
+  elif engine == 'tensornetwork':
+    with backend.precision(backend.resolve_dtype(precision)):
+      qubits = [create_qubit() for _ in range(num_qubits)]
+      for operation in operations:
+        gates.apply_gate(qubits, *operation)
+    return contract_network(qubits)
+  raise ValueError("Unknown simulation engine " + str(engine))
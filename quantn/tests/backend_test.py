@@ -0,0 +1,78 @@
+import subprocess
+import sys
+import numpy as np
+import pytest
+import quantn as qu
+import quantn.backend as backend
+
+def test_gate_tensors_are_shared():
+  first = qu.xgate(qu.create_qubit()).node1
+  second = qu.xgate(qu.create_qubit()).node1
+  assert first.tensor is second.tensor
+  assert not first.tensor.flags.writeable
+
+def test_registry_counts_hits_and_misses():
+  registry = backend.GateRegistry()
+  registry.register('x', [[0, 1], [1, 0]])
+  registry.tensor('x')
+  registry.tensor('x')
+  info = registry.cache_info()
+  assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+def test_registry_evicts_least_recently_used_parameters():
+  registry = backend.GateRegistry(maxsize=2)
+  registry.register_parameterized('phase', lambda t: [[1, 0], [0, np.exp(1j * t)]])
+  registry.tensor('phase', 0.1)
+  registry.tensor('phase', 0.2)
+  registry.tensor('phase', 0.1)
+  registry.tensor('phase', 0.3)
+  assert registry.cache_info().currsize == 2
+  registry.tensor('phase', 0.1)
+  registry.tensor('phase', 0.2)
+  info = registry.cache_info()
+  assert (info.hits, info.misses) == (2, 4)
+
+def test_registry_rejects_unknown_gates():
+  registry = backend.GateRegistry()
+  with pytest.raises(ValueError):
+    registry.tensor('x')
+
+def test_precision_context_sets_gate_and_qubit_dtype():
+  with backend.precision('complex64'):
+    qubit = qu.create_qubit()
+    gate = qu.hgate(qubit)
+  assert qubit.node1.tensor.dtype == np.complex64
+  assert gate.node1.tensor.dtype == np.complex64
+  assert qu.xgate(qu.create_qubit()).node1.tensor.dtype == np.complex128
+
+def test_single_precision_contraction():
+  with backend.precision('single'):
+    qubits = [qu.hgate(qu.create_qubit()) for _ in range(3)]
+    qubits[0], qubits[1] = qu.controlled_xgate(qubits[0], qubits[1])
+    out = qu.contract_network(qubits)
+  assert out.tensor.dtype == np.complex64
+  probabilities = qu.eval_probability(out, normalize=True)
+  assert probabilities.dtype == np.float64
+  assert probabilities.sum() == pytest.approx(1, abs=1e-12)
+
+def test_set_precision_rejects_unknown_dtypes():
+  with pytest.raises(ValueError):
+    backend.set_precision('float16')
+  with pytest.raises(ValueError):
+    backend.set_precision(np.float32)
+
+def test_import_defers_tensornetwork():
+  # a fresh interpreter, the test session has long since loaded everything
+  code = ('import sys, quantn; assert "scipy" not in sys.modules; '
+          'quantn.Circuit(1).execute(); assert "scipy" in sys.modules')
+  subprocess.run([sys.executable, '-c', code], check=True)
+
+def test_lazy_import_returns_loaded_modules():
+  assert backend.lazy_import('numpy') is np
+  with pytest.raises(ModuleNotFoundError):
+    backend.lazy_import('quantn_missing_module')
+
+def test_submodules_are_attributes():
+  code = ('import quantn; assert quantn.gates.xgate is quantn.xgate; '
+          'assert "noise" in dir(quantn)')
+  subprocess.run([sys.executable, '-c', code], check=True)
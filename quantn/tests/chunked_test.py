@@ -0,0 +1,37 @@
+import numpy as np
+import quantn as qu
+import quantn.chunked as chunked
+import quantn.gates as gates
+
+def layered_edges(num_qubits, depth):
+  qubits = [gates.hgate(qu.create_qubit()) for _ in range(num_qubits)]
+  for layer in range(depth):
+    for i in range(layer % 2, num_qubits - 1, 2):
+      qubits[i], qubits[i + 1] = gates.controlled_zgate(qubits[i], qubits[i + 1])
+    qubits = [gates.tgate(gates.hgate(q)) for q in qubits]
+  return qubits
+
+def test_contract_to_memmap_matches_contract_network(tmp_path):
+  reference = qu.contract_network(layered_edges(6, 3)).get_tensor().ravel()
+  state = chunked.contract_to_memmap(layered_edges(6, 3), str(tmp_path / 'state.bin'),
+                                     chunk_bytes=16 * 8)
+  assert isinstance(state, np.memmap)
+  np.testing.assert_allclose(np.asarray(state), reference, atol=1e-12)
+
+def test_streaming_probabilities_and_cdf(tmp_path):
+  node = qu.contract_network(layered_edges(5, 2))
+  reference = qu.eval_probability(node, normalize=True)
+  state = node.get_tensor().ravel()
+  probabilities = chunked.probabilities_to_memmap(state, str(tmp_path / 'p.bin'),
+                                                  chunk_bytes=64)
+  np.testing.assert_allclose(np.asarray(probabilities), reference, atol=1e-15)
+  cdf = chunked.cdf_to_memmap(probabilities, str(tmp_path / 'cdf.bin'), chunk_bytes=64)
+  np.testing.assert_allclose(np.asarray(cdf), np.cumsum(reference), atol=1e-12)
+
+def test_sample_from_disk_matches_in_memory_sampling(tmp_path):
+  node = qu.contract_network(layered_edges(5, 2))
+  reference = qu.sample_bitstrings(node, 500, rng=np.random.default_rng(4))
+  disk_state = chunked.contract_to_disk(layered_edges(5, 2), str(tmp_path), chunk_bytes=128)
+  out = chunked.sample_from_disk(disk_state, 500, rng=np.random.default_rng(4))
+  assert out == reference
+  assert disk_state.shape == (2,) * 5
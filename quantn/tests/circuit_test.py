@@ -128,3 +128,171 @@ def test_random_circuits():
 			with fullprint():
 				print(ref, "\nmine:\n", quantn_result, "ref:\n", cirq_result.final_state)
 		np.testing.assert_allclose(quantn_result, cirq_result.final_state)
+
+def test_compiled_circuit_matches_contract_network():
+	circuit = qu.Circuit(3)
+	circuit.apply_gate(gates.hgate, 0)
+	circuit.apply_gate(gates.controlled_xgate, 0, 1)
+	circuit.apply_gate(gates.tgate, 2)
+	circuit.apply_gate(gates.controlled_hgate, 2, 1)
+	qubits = [qu.create_qubit() for _ in range(3)]
+	for operation in circuit.operations:
+		gates.apply_gate(qubits, *operation)
+	reference = qu.contract_network(qubits).get_tensor()
+	out = circuit.execute().get_tensor()
+	np.testing.assert_allclose(out, reference, atol=1e-12)
+	assert circuit.compile_time is not None
+	assert circuit.execute_time is not None
+
+def test_compiled_circuit_reuses_plan_when_swapping_gates():
+	circuit = qu.Circuit(2)
+	circuit.apply_gate(gates.xgate, 0)
+	circuit.apply_gate(gates.controlled_xgate, 0, 1)
+	plan = circuit.compile()
+	assert qu.take_bitstring(circuit.execute()) == "11"
+	circuit.set_gate(0, gates.rxgate(0.0))
+	assert circuit.compiled
+	assert qu.take_bitstring(circuit.execute()) == "00"
+	# a diagonal gate is wired through COPY nodes, a different structure
+	circuit.set_gate(0, gates.zgate)
+	assert not circuit.compiled
+	assert qu.take_bitstring(circuit.execute()) == "00"
+	assert circuit.compile() is not plan
+	circuit.apply_gate(gates.xgate, 1)
+	assert not circuit.compiled
+
+def test_circuit_rejects_bad_operations():
+	circuit = qu.Circuit(2)
+	with pytest.raises(ValueError):
+		circuit.apply_gate(gates.controlled_xgate, 0)
+	with pytest.raises(ValueError):
+		circuit.apply_gate(gates.xgate, 2)
+	circuit.apply_gate(gates.xgate, 0)
+	with pytest.raises(ValueError):
+		circuit.set_gate(0, gates.controlled_xgate)
+
+def test_parameter_sweep_matches_pointwise_execution():
+	theta, phi = qu.Parameter('theta'), qu.Parameter('phi')
+	circuit = qu.Circuit(3)
+	circuit.apply_gate(gates.hgate, 0)
+	circuit.apply_gate(qu.rygate(theta), 1)
+	circuit.apply_gate(gates.controlled_xgate, 0, 1)
+	circuit.apply_gate(qu.controlled_phasegate(phi), 1, 2)
+	circuit.apply_gate(qu.rxgate(theta), 2)
+	assert circuit.parameters == [theta, phi]
+	values = np.random.default_rng(2).uniform(0, 2 * pi, size=(16, 2))
+	out = circuit.sweep(values)
+	assert out.shape == (16, 8)
+	for row, (t, p) in zip(out, values):
+		reference = circuit.execute({'theta': t, 'phi': p}).get_tensor().ravel()
+		np.testing.assert_allclose(row, reference, atol=1e-12)
+	by_name = circuit.sweep({'theta': values[:, 0], phi: values[:, 1]})
+	np.testing.assert_allclose(by_name, out, atol=1e-12)
+
+def test_parameter_sweep_after_set_gate_makes_a_gate_symbolic():
+	theta = qu.Parameter('theta')
+	circuit = qu.Circuit(2)
+	circuit.apply_gate(qu.rygate(theta), 0)
+	circuit.apply_gate(qu.rxgate(0.3), 1)
+	circuit.apply_gate(gates.controlled_xgate, 0, 1)
+	values = np.array([[0.1], [0.9]])
+	circuit.sweep(values)
+	circuit.set_gate(1, qu.rxgate(theta))
+	assert circuit.compiled
+	out = circuit.sweep(values)
+	for row, (t,) in zip(out, values):
+		reference = circuit.execute({'theta': t}).get_tensor().ravel()
+		np.testing.assert_allclose(row, reference, atol=1e-12)
+
+def test_parameter_sweep_rejects_missing_values():
+	circuit = qu.Circuit(1)
+	circuit.apply_gate(qu.rxgate(qu.Parameter('theta')), 0)
+	with pytest.raises(ValueError):
+		circuit.sweep({'phi': [0.1]})
+	with pytest.raises(ValueError):
+		circuit.execute()
+
+def test_fusion_keeps_symbolic_gates():
+	circuit = qu.Circuit(1)
+	circuit.apply_gate(gates.hgate, 0)
+	circuit.apply_gate(gates.tgate, 0)
+	circuit.apply_gate(qu.rzgate(qu.Parameter('theta')), 0)
+	circuit.apply_gate(gates.hgate, 0)
+	reference = circuit.execute({'theta': 0.3}).get_tensor()
+	report = circuit.optimize()
+	# h t fused into one node, the symbolic rz keeps its values and COPY node
+	assert report.nodes_after == 4
+	np.testing.assert_allclose(circuit.execute({'theta': 0.3}).get_tensor(), reference)
+
+def test_circuit_precision():
+	circuit = qu.Circuit(2, precision='complex64')
+	circuit.apply_gate(gates.hgate, 0)
+	circuit.apply_gate(qu.rygate(qu.Parameter('theta')), 1)
+	out = circuit.execute({'theta': 0.4})
+	assert out.tensor.dtype == np.complex64
+	assert circuit.sweep([[0.1], [0.2]]).dtype == np.complex64
+	circuit.precision = 'complex128'
+	assert not circuit.compiled
+	assert circuit.execute({'theta': 0.4}).tensor.dtype == np.complex128
+
+def test_compiled_circuit_with_multi_qubit_gates():
+	circuit = qu.Circuit(3)
+	circuit.apply_gate(gates.hgate, 0).apply_gate(gates.hgate, 1)
+	circuit.apply_gate(qu.controlled_gate(gates.xgate, 2), 0, 1, 2)
+	reference = circuit.simulate('statevector').get_tensor()
+	np.testing.assert_allclose(circuit.execute().get_tensor(), reference, atol=1e-12)
+	plan = circuit.compile()
+	circuit.set_gate(2, qu.controlled_gate(gates.zgate, 2))
+	assert circuit.compiled and circuit._plan is plan
+	np.testing.assert_allclose(circuit.execute().get_tensor(),
+		circuit.simulate('statevector').get_tensor(), atol=1e-12)
+	circuit.set_gate(2, qu.unitary_gate(np.eye(8)))
+	assert not circuit.compiled
+
+def test_operations_are_stored_compactly():
+	circuit = qu.Circuit(3)
+	circuit.apply_gate(gates.hgate, 0).apply_gate(gates.controlled_xgate, 0, 2)
+	circuit.apply_gate(qu.controlled_gate(gates.xgate, 2), 0, 1, 2)
+	operations = circuit.operations
+	assert len(operations) == 3
+	assert operations[1] == (gates.controlled_xgate, 0, 2)
+	assert operations[-1][1:] == (0, 1, 2)
+	assert operations[:2] == [(gates.hgate, 0), (gates.controlled_xgate, 0, 2)]
+	assert list(operations) == operations[:]
+	with pytest.raises(ValueError):
+		operations[0] = (gates.xgate, 1)
+	operations[0] = (gates.xgate, 0)
+	assert operations[0] == (gates.xgate, 0)
+	circuit.operations = [(gates.hgate, 1)]
+	assert circuit.operations == [(gates.hgate, 1)]
+	assert not circuit.compiled
+
+def test_compiled_network_matches_built_network():
+	circuit = qu.Circuit(4)
+	circuit.apply_gate(gates.hgate, 0).apply_gate(gates.controlled_xgate, 0, 1)
+	circuit.apply_gate(gates.controlled_zgate, 1, 2)
+	circuit.apply_gate(gates.controlled_phasegate(0.3), 2, 3)
+	circuit.apply_gate(qu.controlled_gate(gates.hgate, 2), 3, 0, 2)
+	circuit.apply_gate(gates.rzgate(qu.Parameter('theta')), 1)
+	circuit.apply_gate(qu.unitary_gate(np.kron(gates.gate_operator(gates.hgate),
+		gates.gate_operator(gates.ygate))), 3, 1)
+	params = {'theta': 0.7}
+	qubits, _, _ = circuit.build(params)
+	reference = qu.contract_network(qubits).get_tensor()
+	out = circuit.execute(params).get_tensor()
+	np.testing.assert_allclose(out, reference, atol=1e-12)
+	assert circuit.compile()[0].nodes is None
+
+def test_set_gate_recompiles_when_wiring_differs():
+	rng = np.random.default_rng(1)
+	matrix, _ = np.linalg.qr(rng.normal(size=(4, 4)) + 1j * rng.normal(size=(4, 4)))
+	for before, after in [(gates.controlled_xgate, qu.unitary_gate(matrix)),
+			(gates.controlled_zgate, qu.diagonal_gate([1, 1j, 1, -1]))]:
+		circuit = qu.Circuit(2)
+		circuit.apply_gate(gates.hgate, 0).apply_gate(gates.rygate(0.4), 1)
+		circuit.apply_gate(before, 0, 1)
+		circuit.compile()
+		circuit.set_gate(2, after)
+		assert not circuit.compiled
+		np.testing.assert_allclose(circuit.execute().get_tensor(),
+			circuit.simulate('statevector').get_tensor(), atol=1e-12)
@@ -0,0 +1,36 @@
+import numpy as np
+import quantn as qu
+
+def ghz(num_qubits):
+  circuit = qu.Circuit(num_qubits)
+  circuit.apply_gate(qu.hgate, 0)
+  for i in range(num_qubits - 1):
+    circuit.apply_gate(qu.controlled_xgate, i, i + 1)
+  return circuit
+
+def rotated(theta):
+  circuit = qu.Circuit(2)
+  circuit.apply_gate(qu.rygate(theta), 0)
+  circuit.apply_gate(qu.unitary_gate(np.kron(np.eye(2), [[0, 1], [1, 0]])), 0, 1)
+  return circuit
+
+def test_description_round_trip():
+  circuit = rotated(0.3)
+  rebuilt = qu.Circuit.from_description(circuit.describe())
+  np.testing.assert_allclose(rebuilt.execute().get_tensor(),
+                             circuit.execute().get_tensor())
+
+def test_execute_batch_is_deterministic_across_worker_counts():
+  circuits = [ghz(3), rotated(0.4), ghz(4), rotated(1.2)]
+  calls = []
+  serial = qu.execute_batch(circuits, 200, seed=5,
+                            progress=lambda done, total: calls.append((done, total)))
+  parallel = qu.execute_batch(circuits, 200, workers=2, seed=5)
+  assert serial == parallel
+  assert calls[-1] == (4, 4)
+  assert set(serial[0]) <= {'000', '111'}
+  assert sum(serial[2].values()) == 200
+
+def test_execute_batch_formats():
+  out = qu.execute_batch([ghz(2)], 3, seed=1, format='str')
+  assert len(out[0]) == 3
@@ -0,0 +1,62 @@
+import random
+import numpy as np
+import quantn as qu
+from quantn.fusion import fuse_gates
+
+ops = [qu.xgate, qu.ygate, qu.zgate, qu.hgate, qu.tgate,
+  qu.controlled_xgate, qu.controlled_ygate,
+  qu.controlled_zgate, qu.controlled_hgate]
+
+def test_fusion_preserves_state():
+  rng = random.Random(3)
+  for _ in range(20):
+    num_qubits = rng.randint(1, 5)
+    operations = []
+    for _ in range(rng.randint(0, 20)):
+      gate = rng.choice(ops)
+      if gate.num_qubits == 2 and num_qubits == 1:
+        continue
+      qubits = rng.sample(range(num_qubits), gate.num_qubits)
+      operations.append((gate,) + tuple(qubits))
+    fused, report = fuse_gates(operations)
+    assert report.nodes_after <= report.nodes_before
+    reference = qu.simulate(num_qubits, operations, engine='statevector')
+    out = qu.simulate(num_qubits, fused, engine='tensornetwork')
+    np.testing.assert_allclose(out.get_tensor(), reference.get_tensor(), atol=1e-12)
+
+def test_fusion_cancels_identities():
+  operations = [(qu.xgate, 0), (qu.xgate, 0), (qu.hgate, 1), (qu.hgate, 1)]
+  fused, report = fuse_gates(operations)
+  assert fused == []
+  assert report == (4, 0)
+
+def test_fusion_merges_runs_and_absorbs_into_two_qubit_gates():
+  circuit = qu.Circuit(2)
+  circuit.apply_gate(qu.hgate, 0)
+  circuit.apply_gate(qu.tgate, 0)
+  circuit.apply_gate(qu.hgate, 0)
+  circuit.apply_gate(qu.controlled_xgate, 0, 1)
+  circuit.apply_gate(qu.tgate, 1)
+  reference = circuit.execute().get_tensor()
+  report = circuit.optimize()
+  # the t gates are a values node plus a COPY node each
+  assert report.nodes_before == 7
+  assert report.nodes_after == 1
+  assert circuit.operations[0][0].gate_name == 'unitary'
+  np.testing.assert_allclose(circuit.execute().get_tensor(), reference, atol=1e-12)
+
+def test_fusion_report_counts_nodes():
+  operations = [(qu.zgate, 0), (qu.tgate, 0), (qu.controlled_zgate, 0, 1)]
+  _, report = fuse_gates(operations)
+  assert report == (7, 1)
+
+def test_fusion_keeps_lone_gates():
+  operations = [(qu.tgate, 0), (qu.hgate, 1), (qu.tgate, 1)]
+  fused, _ = fuse_gates(operations)
+  assert fused[0] == (qu.tgate, 0)
+  assert fused[1][0].gate_name == 'unitary'
+
+def test_unitary_gate_matches_named_gate():
+  gate = qu.unitary_gate(qu.gates.gate_operator(qu.hgate))
+  out = qu.contract_network([gate(qu.create_qubit())]).get_tensor()
+  np.testing.assert_allclose(out, np.array([1, 1]) / np.sqrt(2))
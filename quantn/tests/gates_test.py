@@ -220,4 +220,113 @@ def test_multi_apply_gate():
   qu.apply_gate(qubits, qu.controlled_xgate, 0, 1)
   out = qu.contract_network(qubits).get_tensor()
   reference = np.array([[1+0j, 0+0j], [0+0j, 0+0j]])
-  np.testing.assert_allclose(out, reference)
\ No newline at end of file
+  np.testing.assert_allclose(out, reference)
+
+def test_rotation_gates():
+  theta = 0.7
+  out = qu.contract_network([qu.rxgate(theta)(qu.create_qubit())]).get_tensor()
+  np.testing.assert_allclose(out, [np.cos(theta / 2), -1j * np.sin(theta / 2)])
+  out = qu.contract_network([qu.rygate(theta)(qu.create_qubit())]).get_tensor()
+  np.testing.assert_allclose(out, [np.cos(theta / 2), np.sin(theta / 2)])
+  out = qu.contract_network([qu.rzgate(theta)(qu.xgate(qu.create_qubit()))]).get_tensor()
+  np.testing.assert_allclose(out, [0, exp(0.5j * theta)])
+  out = qu.contract_network([qu.phasegate(pi / 4)(qu.xgate(qu.create_qubit()))]).get_tensor()
+  np.testing.assert_allclose(out, [0, exp((1j * pi) / 4)])
+
+def test_controlled_phase_matches_controlled_z():
+  qubits = [qu.xgate(qu.create_qubit()) for _ in range(2)]
+  qu.apply_gate(qubits, qu.controlled_phasegate(pi), 0, 1)
+  out = qu.contract_network(qubits).get_tensor()
+  np.testing.assert_allclose(out, np.array([[0, 0], [0, -1]]), atol=1e-12)
+
+def test_parameterized_gates_share_cached_tensors():
+  first = qu.rxgate(0.25)(qu.create_qubit()).node1
+  second = qu.rxgate(0.25)(qu.create_qubit()).node1
+  assert first.tensor is second.tensor
+
+def test_symbolic_gate_requires_binding():
+  gate = qu.rxgate(qu.Parameter('theta'))
+  with pytest.raises(ValueError):
+    gate(qu.create_qubit())
+  bound = qu.gates.bind(gate, {'theta': 0.5})
+  np.testing.assert_allclose(qu.gates.gate_tensor(bound),
+                             qu.gates.gate_tensor(qu.rxgate(0.5)))
+
+def dense_controlled(matrix, num_controls):
+  size = 2 ** (num_controls + 1)
+  dense = np.eye(size, dtype=complex)
+  dense[-2:, -2:] = matrix
+  return dense
+
+@pytest.mark.parametrize('num_controls', [1, 2, 3])
+def test_controlled_gate_matches_dense_operator(num_controls):
+  n = num_controls + 1
+  gate = qu.controlled_gate(qu.hgate, num_controls)
+  expected = dense_controlled(qu.gates.gate_operator(qu.hgate), num_controls)
+  np.testing.assert_allclose(qu.gates.gate_operator(gate).reshape(2 ** n, 2 ** n),
+                             expected)
+  for basis in range(2 ** n):
+    qubits = [qu.create_qubit() for _ in range(n)]
+    for q in range(n):
+      if basis >> (n - 1 - q) & 1:
+        qubits[q] = qu.xgate(qubits[q])
+    qu.apply_gate(qubits, gate, *range(n))
+    out = qu.contract_network(qubits).get_tensor().ravel()
+    np.testing.assert_allclose(out, expected[:, basis], atol=1e-12)
+
+def test_controlled_gate_nodes_stay_small():
+  qubits = [qu.create_qubit() for _ in range(5)]
+  qu.apply_gate(qubits, qu.controlled_gate(qu.xgate, 4), 4, 0, 1, 2, 3)
+  nodes = {id(edge.node1): edge.node1 for edge in qubits}.values()
+  assert len(nodes) == 5
+  assert max(node.get_rank() for node in nodes) == 4
+
+def test_toffoli_on_reordered_qubits():
+  qubits = [qu.xgate(qu.create_qubit()), qu.create_qubit(), qu.xgate(qu.create_qubit())]
+  qu.apply_gate(qubits, qu.controlled_gate(qu.xgate, 2), 2, 0, 1)
+  assert qu.take_bitstring(qu.contract_network(qubits)) == "111"
+
+def test_three_qubit_unitary_gate():
+  rng = np.random.default_rng(3)
+  matrix, _ = np.linalg.qr(rng.normal(size=(8, 8)) + 1j * rng.normal(size=(8, 8)))
+  qubits = [qu.create_qubit() for _ in range(3)]
+  qu.apply_gate(qubits, qu.unitary_gate(matrix), 0, 1, 2)
+  out = qu.contract_network(qubits).get_tensor().ravel()
+  np.testing.assert_allclose(out, matrix[:, 0], atol=1e-12)
+  with pytest.raises(ValueError):
+    qu.apply_gate(qubits, qu.unitary_gate(matrix), 0, 1, 1)
+
+def test_diagonal_gates_become_hyperedges():
+  qubits = [qu.hgate(qu.create_qubit()) for _ in range(2)]
+  qu.apply_gate(qubits, qu.controlled_zgate, 0, 1)
+  qu.apply_gate(qubits, qu.tgate, 1)
+  spec = qu.contraction.network_spec(qubits)
+  assert qu.contraction.has_hyperedges(spec)
+  # two qubits, two hadamards, the cz diagonal and the t diagonal
+  assert sorted(len(term) for term in spec.inputs) == [1, 1, 1, 2, 2, 2]
+  out = qu.contract_network(qubits).get_tensor()
+  reference = qu.simulate(2, [(qu.hgate, 0), (qu.hgate, 1),
+                              (qu.controlled_zgate, 0, 1), (qu.tgate, 1)],
+                          engine='statevector').get_tensor()
+  np.testing.assert_allclose(out, reference, atol=1e-12)
+
+def test_unitary_gate_detects_diagonal_matrices():
+  gate = qu.unitary_gate(np.diag([1, 1j, -1, 1]))
+  assert gate.gate_name == 'diagonal'
+  np.testing.assert_allclose(qu.gates.gate_operator(gate).reshape(4, 4),
+                             np.diag([1, 1j, -1, 1]))
+  qubits = [qu.xgate(qu.create_qubit()), qu.create_qubit()]
+  qu.apply_gate(qubits, gate, 0, 1)
+  np.testing.assert_allclose(qu.contract_network(qubits).get_tensor(),
+                             [[0, 0], [-1, 0]])
+
+def test_qft_matches_statevector():
+  n = 5
+  operations = [(qu.xgate, 1), (qu.hgate, 3)]
+  for q in range(n):
+    operations.append((qu.hgate, q))
+    for k, target in enumerate(range(q + 1, n), 2):
+      operations.append((qu.controlled_phasegate(2 * pi / 2 ** k), target, q))
+  reference = qu.simulate(n, operations, engine='statevector').get_tensor()
+  out = qu.simulate(n, operations, engine='tensornetwork').get_tensor()
+  np.testing.assert_allclose(out, reference, atol=1e-12)
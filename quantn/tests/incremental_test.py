@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import quantn as qu
+from quantn.incremental import first_difference
+
+def random_operations(num_qubits, num_gates, seed):
+  rng = np.random.default_rng(seed)
+  operations = []
+  for _ in range(num_gates):
+    if rng.random() < 0.3:
+      q_0, q_1 = rng.choice(num_qubits, 2, replace=False)
+      operations.append((qu.controlled_xgate, int(q_0), int(q_1)))
+    else:
+      gate = [qu.hgate, qu.tgate, qu.rxgate(rng.uniform(0, np.pi))][rng.integers(3)]
+      operations.append((gate, int(rng.integers(num_qubits))))
+  return operations
+
+def reference(num_qubits, operations):
+  return qu.simulate(num_qubits, operations, engine='statevector').get_tensor()
+
+def test_appending_gates_reuses_the_prefix():
+  evaluator = qu.IncrementalEvaluator(4, interval=5)
+  operations = random_operations(4, 12, 0)
+  out = evaluator.evaluate(operations).get_tensor()
+  np.testing.assert_allclose(out, reference(4, operations), atol=1e-12)
+  assert evaluator.checkpoints == [5, 10, 12]
+  operations += random_operations(4, 3, 1)
+  out = evaluator.evaluate(operations).get_tensor()
+  np.testing.assert_allclose(out, reference(4, operations), atol=1e-12)
+  assert (evaluator.reused, evaluator.recomputed) == (12, 3)
+
+def test_replacing_a_gate_resumes_from_the_checkpoint_before_it():
+  evaluator = qu.IncrementalEvaluator(3, interval=4)
+  operations = random_operations(3, 16, 2)
+  evaluator.evaluate(operations)
+  operations[9] = (qu.rygate(0.4), 1)
+  out = evaluator.evaluate(operations).get_tensor()
+  np.testing.assert_allclose(out, reference(3, operations), atol=1e-12)
+  assert evaluator.reused == 8
+  # an equal but freshly built gate does not count as a change
+  operations[9] = (qu.rygate(0.4), 1)
+  evaluator.evaluate(operations)
+  assert evaluator.recomputed == 0
+
+def test_symbolic_circuit_parameters():
+  circuit = qu.Circuit(2)
+  circuit.apply_gate(qu.hgate, 0).apply_gate(qu.rxgate(qu.Parameter('a')), 1)
+  circuit.apply_gate(qu.controlled_xgate, 0, 1)
+  evaluator = qu.IncrementalEvaluator(2, interval=1)
+  for value in (0.1, 0.7):
+    out = evaluator.evaluate(circuit, {'a': value}).get_tensor()
+    np.testing.assert_allclose(out, circuit.execute({'a': value}).get_tensor(), atol=1e-12)
+  assert evaluator.reused == 1
+
+def test_invalidate_and_memory_limit():
+  operations = random_operations(3, 8, 3)
+  evaluator = qu.IncrementalEvaluator(3, max_bytes=2 * 8 * 16, interval=2)
+  evaluator.evaluate(operations)
+  assert evaluator.checkpoints == [6, 8]
+  assert evaluator.nbytes <= evaluator.max_bytes
+  evaluator.invalidate(6)
+  assert evaluator.checkpoints == [6]
+  evaluator.evaluate(operations)
+  assert evaluator.reused == 6
+  evaluator.invalidate()
+  assert evaluator.checkpoints == []
+  out = evaluator.evaluate(operations)
+  assert evaluator.reused == 0
+  with pytest.raises(ValueError):
+    out.tensor[(0, 0, 0)] = 1
+
+def test_first_difference():
+  ops = [(qu.hgate, 0), (qu.xgate, 1)]
+  assert first_difference(ops, ops + [(qu.tgate, 0)]) == 2
+  assert first_difference(ops, [(qu.hgate, 0), (qu.xgate, 0)]) == 1
+  assert first_difference(ops, []) == 0
@@ -0,0 +1,81 @@
+import json
+import numpy as np
+import quantn as qu
+import quantn.instrument as instrument
+
+def bell_pair():
+  qubits = [qu.create_qubit() for _ in range(2)]
+  qu.apply_gate(qubits, qu.hgate, 0)
+  qu.apply_gate(qubits, qu.controlled_xgate, 0, 1)
+  qu.apply_gate(qubits, qu.unitary_gate(np.eye(2)), 1)
+  return qubits
+
+def test_disabled_by_default():
+  assert not instrument.enabled()
+  assert instrument.span('contract') is instrument.span('find_path')
+
+def test_record_counts_nodes_and_times_phases():
+  with instrument.record() as recorder:
+    node = qu.contract_network(bell_pair())
+  assert not instrument.enabled()
+  # the identity is diagonal, a values node plus one COPY node
+  assert recorder.nodes == {'qubit': 2, 'h': 1, 'cx': 1, 'diagonal': 2}
+  assert recorder.edges == {'qubit': 2, 'h': 2, 'cx': 4, 'diagonal': 4}
+  names = [event.name for event in recorder.events]
+  assert names.index('find_path') < names.index('contract')
+  assert recorder.total('find_path') >= 0
+  # one intermediate per pairwise step, the last one is the state itself
+  assert len(recorder.intermediates) == 4
+  assert recorder.intermediates[-1] == {'shape': (2, 2), 'bytes': 64}
+  assert recorder.peak_intermediate() >= 64
+  np.testing.assert_allclose(np.abs(node.tensor.ravel()) ** 2, [0.5, 0, 0, 0.5])
+
+def test_instrumented_contraction_matches_default():
+  expected = qu.contract_network(bell_pair()).tensor
+  with instrument.record():
+    np.testing.assert_allclose(qu.contract_network(bell_pair()).tensor, expected)
+
+def test_callbacks_receive_events():
+  seen = []
+  instrument.add_callback(seen.append)
+  try:
+    qu.create_qubit()
+  finally:
+    instrument.remove_callback(seen.append)
+  assert [(event.name, event.args['gate']) for event in seen] == [('node', 'qubit')]
+  qu.create_qubit()
+  assert len(seen) == 1
+
+def test_chrome_trace_export(tmp_path):
+  with instrument.record() as recorder:
+    circuit = qu.Circuit(2)
+    circuit.apply_gate(qu.hgate, 0)
+    circuit.build()
+    circuit.execute()
+  filename = str(tmp_path / 'trace.json')
+  recorder.export_chrome_trace(filename)
+  with open(filename) as handle:
+    trace = json.load(handle)['traceEvents']
+  spans = [event for event in trace if event['ph'] == 'X']
+  assert {'find_path', 'contract'} <= {event['name'] for event in spans}
+  assert all(event['dur'] >= 0 for event in spans)
+  assert any(event['ph'] == 'i' and event['args']['gate'] == 'h' for event in trace)
+
+def test_compile_creates_no_nodes():
+  circuit = qu.Circuit(2)
+  circuit.apply_gate(qu.hgate, 0)
+  circuit.apply_gate(qu.controlled_xgate, 0, 1)
+  with instrument.record() as recorder:
+    circuit.execute()
+  assert not recorder.nodes
+  assert recorder.total('find_path') >= 0
+
+def test_compiled_execution_reports_intermediates():
+  circuit = qu.Circuit(2)
+  circuit.apply_gate(qu.hgate, 0).apply_gate(qu.hgate, 1)
+  circuit.apply_gate(qu.controlled_zgate, 0, 1).apply_gate(qu.hgate, 1)
+  expected = circuit.execute().tensor
+  with instrument.record() as recorder:
+    np.testing.assert_allclose(circuit.execute().tensor, expected, atol=1e-12)
+  assert len(recorder.intermediates) == len(circuit.compile().path)
+  assert recorder.intermediates[-1] == {'shape': (2, 2), 'bytes': 64}
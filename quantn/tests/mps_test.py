@@ -0,0 +1,61 @@
+import random
+import numpy as np
+import pytest
+import quantn as qu
+
+ops = [qu.xgate, qu.ygate, qu.zgate, qu.hgate, qu.tgate,
+  qu.controlled_xgate, qu.controlled_ygate,
+  qu.controlled_zgate, qu.controlled_hgate]
+
+def random_operations(rng, num_qubits, num_gates):
+  operations = []
+  for _ in range(num_gates):
+    gate = rng.choice(ops)
+    if gate.num_qubits == 1:
+      operations.append((gate, rng.randrange(num_qubits)))
+    else:
+      operations.append((gate,) + tuple(rng.sample(range(num_qubits), 2)))
+  return operations
+
+def test_mps_matches_statevector():
+  rng = random.Random(11)
+  for _ in range(20):
+    num_qubits = rng.randint(2, 6)
+    operations = random_operations(rng, num_qubits, rng.randint(0, 15))
+    reference = qu.simulate(num_qubits, operations, engine='statevector')
+    out = qu.simulate(num_qubits, operations, engine='mps')
+    np.testing.assert_allclose(out.get_tensor(), reference.get_tensor(), atol=1e-10)
+
+def test_mps_exact_without_truncation():
+  sim = qu.MPSSimulator(4)
+  sim.apply_gate(qu.hgate, 0)
+  sim.apply_gate(qu.controlled_xgate, 0, 3)
+  assert sim.truncation_error < 1e-12
+  assert abs(sim.amplitude('0000')) ** 2 == pytest.approx(0.5)
+
+def test_mps_truncation_bounds_bond_dimension():
+  rng = random.Random(5)
+  sim = qu.MPSSimulator(8, max_bond=2)
+  for gate, *qubits in random_operations(rng, 8, 60):
+    sim.apply_gate(gate, *qubits)
+  assert max(sim.bond_dimensions) <= 2
+  assert sim.truncation_error > 0
+  probabilities = qu.eval_probability(sim.state(), normalize=True)
+  assert probabilities.sum() == pytest.approx(1)
+
+def test_mps_sampling_on_many_qubits():
+  sim = qu.MPSSimulator(100, max_bond=4)
+  sim.apply_gate(qu.hgate, 0)
+  for i in range(99):
+    sim.apply_gate(qu.controlled_xgate, i, i + 1)
+  counts = sim.sample_bitstrings(200, rng=np.random.default_rng(1), format='counts')
+  assert set(counts) <= {'0' * 100, '1' * 100}
+  assert max(sim.bond_dimensions) <= 2
+
+def test_mps_sampling_matches_take_bitstring():
+  sim = qu.MPSSimulator(3)
+  sim.apply_gate(qu.xgate, 0)
+  sim.apply_gate(qu.controlled_xgate, 0, 1)
+  sim.apply_gate(qu.controlled_xgate, 1, 2)
+  assert qu.take_bitstring(sim.state()) == "111"
+  assert sim.sample_bitstrings(3) == ["111"] * 3
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+import quantn as qu
+import quantn.gates as gates
+import quantn.noise as noise
+import quantn.serialization as serialization
+
+def entangling_circuit():
+  circuit = qu.Circuit(3)
+  circuit.apply_gate(gates.hgate, 0).apply_gate(gates.controlled_ygate, 0, 1)
+  circuit.apply_gate(gates.tgate, 1).apply_gate(gates.controlled_phasegate(0.4), 1, 2)
+  circuit.apply_gate(qu.controlled_gate(gates.rygate(0.3), 2), 0, 1, 2)
+  circuit.apply_gate(gates.rzgate(qu.Parameter('a')), 2).apply_gate(gates.hgate, 2)
+  return circuit
+
+def noisy_circuit():
+  circuit = entangling_circuit()
+  circuit.apply_gate(qu.depolarizing_channel(0.2), 0)
+  circuit.apply_gate(qu.amplitude_damping_channel(0.3), 1)
+  circuit.apply_gate(gates.hgate, 0)
+  circuit.apply_gate(qu.readout_error(0.05, 0.1), 2)
+  return circuit
+
+def test_channels_are_trace_preserving():
+  for channel in [qu.depolarizing_channel(0.3), qu.amplitude_damping_channel(0.2),
+                  qu.readout_error(0.1, 0.2)]:
+    kraus = channel.kraus
+    np.testing.assert_allclose(np.einsum('kji,kjl->il', kraus.conj(), kraus), np.eye(2))
+  assert len(qu.depolarizing_channel(0).kraus) == 1
+  with pytest.raises(ValueError):
+    qu.amplitude_damping_channel(1.5)
+
+def test_channels_need_a_noise_mode():
+  qubits = [qu.create_qubit()]
+  with pytest.raises(ValueError):
+    qu.apply_gate(qubits, qu.depolarizing_channel(0.1), 0)
+  circuit = qu.Circuit(1).apply_gate(qu.depolarizing_channel(0.1), 0)
+  with pytest.raises(ValueError):
+    circuit.execute()
+
+def test_noiseless_density_matrix_is_the_pure_state():
+  circuit = entangling_circuit()
+  pure = qu.Circuit(3)
+  for gate, *qubits in circuit.operations:
+    pure.apply_gate(gates.bind(gate, {'a': 0.7}), *qubits)
+  psi = pure.simulate('statevector').get_tensor().ravel()
+  rho = qu.density_matrix(circuit, {'a': 0.7}).get_tensor().reshape(8, 8)
+  np.testing.assert_allclose(rho, np.outer(psi, psi.conj()), atol=1e-12)
+
+def test_density_state_through_apply_gate():
+  # |1> damped by gamma, then a full depolarization of the other qubit
+  state = qu.DensityState(2)
+  qu.apply_gate(state, gates.xgate, 0)
+  qu.apply_gate(state, qu.amplitude_damping_channel(0.25), 0)
+  qu.apply_gate(state, gates.hgate, 1)
+  qu.apply_gate(state, qu.depolarizing_channel(1.0), 1)
+  rho = qu.density_matrix(state).get_tensor()
+  np.testing.assert_allclose(rho[:, 0, :, 0], np.diag([0.125, 0.375]), atol=1e-12)
+  np.testing.assert_allclose(rho[0, :, 0, :], np.diag([0.125, 0.125]), atol=1e-12)
+  np.testing.assert_allclose(noise.density_probabilities(qu.density_matrix(state)),
+                             [[0.125, 0.125], [0.375, 0.375]], atol=1e-12)
+
+def test_readout_error_flips_outcomes():
+  circuit = qu.Circuit(1).apply_gate(gates.xgate, 0)
+  circuit.apply_gate(qu.readout_error(0.0, 0.2), 0)
+  np.testing.assert_allclose(noise.noisy_probabilities(circuit), [0.2, 0.8])
+
+def test_trajectories_estimate_the_density_matrix():
+  circuit = noisy_circuit()
+  exact = noise.noisy_probabilities(circuit, params={'a': 0.7})
+  estimate = noise.noisy_probabilities(circuit, 'trajectory', params={'a': 0.7},
+                                       trajectories=8000, batch_size=500, seed=3)
+  np.testing.assert_allclose(estimate, exact, atol=0.03)
+
+def test_trajectories_do_not_depend_on_workers():
+  circuit = noisy_circuit()
+  options = dict(params={'a': 0.7}, trajectories=300, batch_size=64, seed=5)
+  serial = noise.trajectory_probabilities(circuit, **options)
+  pooled = noise.trajectory_probabilities(circuit, workers=2, **options)
+  np.testing.assert_allclose(pooled, serial)
+
+def test_sample_noisy_formats():
+  circuit = qu.Circuit(2).apply_gate(gates.xgate, 0)
+  circuit.apply_gate(qu.readout_error(0.0, 0.0), 1)
+  counts = qu.sample_noisy(circuit, 50, rng=np.random.default_rng(0), format='counts')
+  assert counts == {'10': 50}
+  bits = qu.sample_noisy(circuit, 4, 'trajectory', format='bits', trajectories=8, seed=0)
+  np.testing.assert_array_equal(bits, [[1, 0]] * 4)
+  with pytest.raises(ValueError):
+    qu.sample_noisy(circuit, 1, 'unknown')
+
+def test_channels_round_trip_and_block_fusion():
+  circuit = noisy_circuit()
+  loaded = serialization.loads(serialization.dumps(circuit))
+  assert [operation[0].params for operation in loaded.operations] == \
+    [operation[0].params for operation in circuit.operations]
+  np.testing.assert_allclose(noise.noisy_probabilities(loaded, params={'a': 0.7}),
+                             noise.noisy_probabilities(circuit, params={'a': 0.7}))
+  fused = qu.Circuit(1).apply_gate(gates.hgate, 0)
+  fused.apply_gate(qu.depolarizing_channel(0.1), 0).apply_gate(gates.hgate, 0)
+  fused.optimize()
+  assert [gates.is_channel(operation[0]) for operation in fused.operations] == \
+    [False, True, False]
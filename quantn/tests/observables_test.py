@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+import quantn as qu
+import quantn.observables as observables
+
+def layered_operations(num_qubits, depth, seed):
+  rng = np.random.default_rng(seed)
+  operations = []
+  for layer in range(depth):
+    for q in range(num_qubits):
+      operations.append((qu.rygate(rng.uniform(0, np.pi)), q))
+      operations.append((qu.rzgate(rng.uniform(0, np.pi)), q))
+    for q in range(layer % 2, num_qubits - 1, 2):
+      operations.append((qu.controlled_xgate, q, q + 1))
+  return operations
+
+def network(num_qubits, operations):
+  qubits = [qu.create_qubit() for _ in range(num_qubits)]
+  for operation in operations:
+    qu.apply_gate(qubits, *operation)
+  return qubits
+
+def dense_expectation(state, string):
+  matrices = {'I': np.eye(2)}
+  for name, gate in observables.PAULIS.items():
+    matrices[name] = qu.gates.gate_operator(gate)
+  operator = np.ones((1, 1))
+  for c in string:
+    operator = np.kron(operator, matrices[c])
+  vector = state.ravel()
+  return np.vdot(vector, operator @ vector) / np.vdot(vector, vector)
+
+def test_pauli_strings_match_dense_state():
+  operations = layered_operations(5, 3, 1)
+  state = qu.simulate(5, operations, engine='statevector').get_tensor()
+  for string in ['ZIIII', 'XXIII', 'IYZXI', 'ZZZZZ', 'IIIII', 'YIIIY']:
+    out = qu.expectation(network(5, operations), string)
+    np.testing.assert_allclose(out, dense_expectation(state, string).real, atol=1e-12)
+
+def test_weighted_sum_and_normalization():
+  operations = layered_operations(4, 2, 2)
+  state = qu.simulate(4, operations, engine='statevector').get_tensor()
+  observable = {'ZZII': 0.5, 'IZZI': -1.25, 'XIIX': 2.0, 'IIII': 0.1}
+  qubits = network(4, operations)
+  # an unnormalized projection, the expectation divides by the norm
+  qubits[0] = qu.unitary_gate([[1, 0], [0, 0.5]])(qubits[0])
+  scaled = np.array(state)
+  scaled[1] *= 0.5
+  reference = sum(c * dense_expectation(scaled, s).real for s, c in observable.items())
+  np.testing.assert_allclose(qu.expectation(qubits, observable), reference, atol=1e-12)
+
+def test_terms_share_sub_network_contractions(monkeypatch):
+  steps = []
+  original = observables.contraction.oe.contract
+  def counted(*args, **kwargs):
+    steps.append(args[0])
+    return original(*args, **kwargs)
+  monkeypatch.setattr(observables.contraction.oe, 'contract', counted)
+  qubits = network(4, layered_operations(4, 2, 3))
+  qu.expectation(qubits, 'IIII')
+  single = len(steps)
+  steps.clear()
+  strings = ['XZII', 'ZXII', 'YYII', 'IIIZ', 'IIZZ']
+  qu.expectation(qubits, {string: 1.0 for string in strings})
+  # without sharing every term would redo every step of the norm
+  assert len(steps) < single * (len(strings) + 1) / 2
+
+def test_high_weight_strings_stay_small():
+  operations = layered_operations(11, 1, 4)
+  state = qu.simulate(11, operations, engine='statevector').get_tensor()
+  with qu.instrument.record() as recorder:
+    out = qu.expectation(network(11, operations), 'Z' * 11)
+  np.testing.assert_allclose(out, dense_expectation(state, 'Z' * 11).real, atol=1e-12)
+  # a reduced density matrix on all eleven qubits would take 64 MiB
+  assert 0 < recorder.peak_intermediate() <= state.nbytes
+
+def test_complex_coefficients_and_bad_strings():
+  qubits = network(2, [(qu.hgate, 0)])
+  assert qu.expectation(qubits, {'XI': 1j}) == pytest.approx(1j)
+  with pytest.raises(ValueError):
+    qu.expectation(qubits, 'XYZ')
+  with pytest.raises(ValueError):
+    qu.expectation(qubits, 'XA')
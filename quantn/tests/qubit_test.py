@@ -2,6 +2,7 @@ import pytest
 import numpy as np
 import quantn as qu
 import quantn.gates as gates
+import tensornetwork as tn
 
 def test_qubit_init():
   q_0_edge = qu.create_qubit()
@@ -23,3 +24,138 @@ def test_eval_probability_returns_probability_amplitude():
   reference = np.array([1, 0])
   state = qu.eval_probability(q_0.node1)
   np.testing.assert_allclose(state, reference)
+
+def test_sample_bitstrings_is_reproducible():
+  qubits = [gates.hgate(qu.create_qubit()) for _ in range(3)]
+  contracted = qu.contract_network(qubits)
+  first = qu.sample_bitstrings(contracted, 100, rng=np.random.default_rng(3))
+  second = qu.take_bitstring(contracted, shots=100, rng=np.random.default_rng(3))
+  assert first == second
+  assert len(first) == 100
+  assert all(len(bitstring) == 3 for bitstring in first)
+
+def test_sample_bitstrings_formats():
+  qubits = [qu.create_qubit() for _ in range(3)]
+  qubits[0] = gates.xgate(qubits[0])
+  contracted = qu.contract_network(qubits)
+  bits = qu.sample_bitstrings(contracted, 4, format='bits')
+  np.testing.assert_array_equal(bits, np.tile([1, 0, 0], (4, 1)))
+  assert bits.dtype == np.uint8
+  packed = qu.sample_bitstrings(contracted, 4, format='packed')
+  np.testing.assert_array_equal(packed, np.full((4, 1), 0b10000000))
+  assert qu.sample_bitstrings(contracted, 4, format='counts') == {'100': 4}
+
+def test_sample_bitstrings_accepts_zero_shots():
+  contracted = qu.contract_network([qu.create_qubit() for _ in range(2)])
+  assert qu.sample_bitstrings(contracted, 0) == []
+  assert qu.sample_bitstrings(contracted, 0, format='counts') == {}
+  assert qu.sample_bitstrings(contracted, 0, format='bits').shape == (0, 2)
+
+def test_sample_bitstrings_histogram_matches_distribution():
+  qubits = [gates.hgate(qu.create_qubit())]
+  contracted = qu.contract_network(qubits)
+  counts = qu.sample_bitstrings(contracted, 10000, format='counts',
+                                rng=np.random.default_rng(0))
+  assert set(counts) == {'0', '1'}
+  assert abs(counts['0'] - 5000) < 300
+
+def test_sample_bitstrings_rejects_unknown_format():
+  contracted = qu.contract_network([qu.create_qubit()])
+  with pytest.raises(ValueError):
+    qu.sample_bitstrings(contracted, 1, format='bytes')
+
+def ghz_edges(num_qubits):
+  qubits = [qu.create_qubit() for _ in range(num_qubits)]
+  qubits[0] = gates.hgate(qubits[0])
+  for i in range(num_qubits - 1):
+    qubits[i], qubits[i + 1] = gates.controlled_xgate(qubits[i], qubits[i + 1])
+  return qubits
+
+@pytest.mark.parametrize('strategy', ['greedy', 'optimal', 'branch', 'auto'])
+def test_contract_network_strategies(strategy):
+  reference = qu.contract_network(ghz_edges(4)).get_tensor()
+  out = qu.contract_network(ghz_edges(4), strategy=strategy).get_tensor()
+  np.testing.assert_allclose(out, reference)
+
+def test_contract_network_custom_strategy():
+  def left_to_right(inputs, output, size_dict):
+    return [(0, 1)] * (len(inputs) - 1)
+  reference = qu.contract_network(ghz_edges(3)).get_tensor()
+  out = qu.contract_network(ghz_edges(3), strategy=left_to_right).get_tensor()
+  np.testing.assert_allclose(out, reference)
+
+def test_contract_network_rejects_unknown_strategy():
+  with pytest.raises(ValueError):
+    qu.contract_network(ghz_edges(2), strategy='fastest')
+
+def test_estimate_contraction_leaves_network_intact():
+  qubits = ghz_edges(5)
+  estimate = qu.estimate_contraction(qubits)
+  assert estimate.flops > 0
+  assert estimate.peak_size >= 2 ** 5
+  assert len(estimate.path) == len(qu.contraction.collect_nodes(qubits)) - 1
+  out = qu.contract_network(qubits)
+  assert qu.take_bitstring(out) in ("00000", "11111")
+
+def layered_edges(num_qubits, depth):
+  qubits = [gates.hgate(qu.create_qubit()) for _ in range(num_qubits)]
+  for layer in range(depth):
+    for i in range(layer % 2, num_qubits - 1, 2):
+      qubits[i], qubits[i + 1] = gates.controlled_zgate(qubits[i], qubits[i + 1])
+    qubits = [gates.tgate(gates.hgate(q)) for q in qubits]
+  return qubits
+
+def projected_edges(num_qubits, depth, keep):
+  # close all but `keep` outputs so intermediates outgrow the output tensor
+  qubits = layered_edges(num_qubits, depth)
+  for edge in qubits[keep:]:
+    edge ^ tn.Node(np.array([1, 0], dtype=complex))[0]
+  return qubits[:keep]
+
+def test_sliced_contraction_respects_memory_limit():
+  reference = qu.contract_network(projected_edges(8, 6, 2)).get_tensor()
+  qubits = projected_edges(8, 6, 2)
+  spec = qu.contraction.network_spec(qubits)
+  peak = qu.estimate_contraction(qubits).peak_size
+  symbols = qu.contraction.choose_slices(spec, 16 * peak // 2)
+  assert symbols
+  out = qu.contract_network(qubits, memory_limit=16 * peak // 2).get_tensor()
+  np.testing.assert_allclose(out, reference, atol=1e-12)
+
+def test_sliced_contraction_in_process_pool():
+  reference = qu.contract_network(projected_edges(8, 6, 2)).get_tensor()
+  qubits = projected_edges(8, 6, 2)
+  peak = qu.estimate_contraction(qubits).peak_size
+  out = qu.contract_network(qubits, memory_limit=16 * peak // 2,
+                            workers=2).get_tensor()
+  np.testing.assert_allclose(out, reference, atol=1e-12)
+
+def test_sliced_contraction_rejects_impossible_limit():
+  with pytest.raises(ValueError):
+    qu.contract_network(layered_edges(3, 2), memory_limit=16)
+
+def test_amplitudes_match_full_state():
+  reference = qu.contract_network(layered_edges(5, 3)).get_tensor()
+  qubits = layered_edges(5, 3)
+  bitstrings = ['00000', '10110', '11111', '01001']
+  out = qu.amplitudes(qubits, bitstrings)
+  expected = [reference[tuple(int(b) for b in bitstring)] for bitstring in bitstrings]
+  np.testing.assert_allclose(out, expected, atol=1e-12)
+  chunked = qu.amplitudes(qubits, np.array([[int(b) for b in s] for s in bitstrings]),
+                          batch_size=3)
+  np.testing.assert_allclose(chunked, expected, atol=1e-12)
+
+def test_single_amplitude():
+  qubits = ghz_edges(4)
+  assert abs(qu.amplitude(qubits, '1111') - 1 / np.sqrt(2)) < 1e-12
+  assert abs(qu.amplitude(qubits, '0101')) < 1e-12
+
+def test_amplitudes_reject_wrong_width():
+  with pytest.raises(ValueError):
+    qu.amplitudes(ghz_edges(3), ['01'])
+
+def test_amplitudes_reject_bits_other_than_zero_and_one():
+  with pytest.raises(ValueError):
+    qu.amplitudes(ghz_edges(3), ['012'])
+  with pytest.raises(ValueError):
+    qu.amplitudes(ghz_edges(3), np.array([[0, -1, 1]]))
@@ -0,0 +1,91 @@
+import io
+import os
+import numpy as np
+import pytest
+import quantn as qu
+import quantn.serialization as serialization
+
+def sample_circuit():
+  circuit = qu.Circuit(3, precision='complex64')
+  circuit.apply_gate(qu.hgate, 0)
+  circuit.apply_gate(qu.controlled_xgate, 0, 1)
+  circuit.apply_gate(qu.rygate(0.25), 2)
+  circuit.apply_gate(qu.controlled_phasegate(qu.Parameter('phi')), 1, 2)
+  circuit.apply_gate(qu.unitary_gate(np.kron([[0, 1], [1, 0]], np.eye(2))), 2, 0)
+  return circuit
+
+def test_round_trip_preserves_circuit():
+  circuit = sample_circuit()
+  data = serialization.dumps(circuit)
+  rebuilt = serialization.loads(data)
+  assert rebuilt.precision == 'complex64'
+  assert [op[1:] for op in rebuilt.operations] == [op[1:] for op in circuit.operations]
+  assert rebuilt.parameters == circuit.parameters
+  np.testing.assert_allclose(rebuilt.execute({'phi': 0.7}).get_tensor(),
+                             circuit.execute({'phi': 0.7}).get_tensor())
+  assert serialization.dumps(rebuilt) == data
+
+def test_dump_and_load_files(tmp_path):
+  circuit = sample_circuit()
+  filename = str(tmp_path / 'circuit.qtn')
+  serialization.dump(circuit, filename)
+  assert serialization.circuit_hash(serialization.load(filename)) == \
+    serialization.circuit_hash(circuit)
+  buffer = io.BytesIO()
+  serialization.dump(circuit, buffer)
+  buffer.seek(0)
+  assert len(serialization.load(buffer)) == len(circuit)
+
+def test_loads_rejects_garbage():
+  with pytest.raises(ValueError):
+    serialization.loads(b'\0' * 64)
+
+def test_cache_reuses_paths_and_states(tmp_path):
+  cache = serialization.CircuitCache(str(tmp_path))
+  circuit = sample_circuit()
+  first = circuit.execute({'phi': 0.1}, cache=cache).get_tensor()
+  assert cache.get_path(circuit) == list(circuit._plan.path)
+  again = sample_circuit()
+  hits = cache.hits
+  second = again.execute({'phi': 0.1}, cache=cache).get_tensor()
+  assert cache.hits == hits + 1
+  assert not again.compiled
+  np.testing.assert_allclose(second, first)
+  other = again.execute({'phi': 0.2}, cache=cache).get_tensor()
+  assert not np.allclose(other, first)
+
+def test_cache_keys_follow_global_precision(tmp_path):
+  cache = serialization.CircuitCache(str(tmp_path))
+  circuit = qu.Circuit(1)
+  circuit.apply_gate(qu.hgate, 0)
+  circuit.execute(cache=cache)
+  with qu.backend.precision('complex64'):
+    assert circuit.execute(cache=cache).get_tensor().dtype == np.complex64
+  assert circuit.execute(cache=cache).get_tensor().dtype == np.complex128
+
+def test_cache_evicts_least_recently_used(tmp_path):
+  cache = serialization.CircuitCache(str(tmp_path), max_bytes=10 ** 9)
+  circuits = []
+  for theta in (0.1, 0.2, 0.3):
+    circuit = qu.Circuit(1)
+    circuit.apply_gate(qu.rxgate(theta), 0)
+    cache.put_state(circuit, circuit.execute().get_tensor())
+    circuits.append(circuit)
+  for i, name in enumerate(sorted(os.listdir(str(tmp_path)))):
+    os.utime(os.path.join(str(tmp_path), name), (i, i))
+  os.utime(cache._file(serialization.circuit_hash(circuits[0]), 'state'), (10, 10))
+  cache.max_bytes = cache.size() - 1
+  cache.evict()
+  remaining = len(os.listdir(str(tmp_path)))
+  assert remaining == 2
+  assert cache.get_state(circuits[0]) is not None
+
+def test_round_trip_multi_qubit_gates():
+  circuit = qu.Circuit(4)
+  circuit.apply_gate(qu.hgate, 1)
+  circuit.apply_gate(qu.controlled_gate(qu.rxgate(0.3), 3), 1, 0, 3, 2)
+  circuit.apply_gate(qu.unitary_gate(np.eye(8)[::-1]), 0, 2, 3)
+  rebuilt = serialization.loads(serialization.dumps(circuit))
+  np.testing.assert_allclose(rebuilt.execute().get_tensor(),
+                             circuit.execute().get_tensor())
+  assert serialization.circuit_hash(rebuilt) == serialization.circuit_hash(circuit)
@@ -0,0 +1,89 @@
+import random
+import numpy as np
+import pytest
+import quantn as qu
+import quantn.simulator as simulator
+
+ops = [qu.xgate, qu.ygate, qu.zgate, qu.hgate, qu.tgate,
+  qu.controlled_xgate, qu.controlled_ygate,
+  qu.controlled_zgate, qu.controlled_hgate]
+
+def random_operations(rng, num_qubits, num_gates):
+  operations = []
+  for _ in range(num_gates):
+    gate = rng.choice(ops)
+    if gate.num_qubits == 1:
+      operations.append((gate, rng.randrange(num_qubits)))
+    else:
+      q_0, q_1 = rng.sample(range(num_qubits), 2)
+      operations.append((gate, q_0, q_1))
+  return operations
+
+def test_statevector_matches_tensornetwork():
+  rng = random.Random(7)
+  for _ in range(20):
+    num_qubits = rng.randint(2, 6)
+    operations = random_operations(rng, num_qubits, rng.randint(0, 12))
+    network = qu.simulate(num_qubits, operations, engine='tensornetwork')
+    dense = qu.simulate(num_qubits, operations, engine='statevector')
+    np.testing.assert_allclose(qu.eval_probability(dense),
+                               qu.eval_probability(network), atol=1e-12)
+
+def test_statevector_bitstring():
+  sim = qu.StateVectorSimulator(3)
+  sim.apply_gate(qu.xgate, 0)
+  sim.apply_gate(qu.controlled_xgate, 0, 1)
+  sim.apply_gate(qu.controlled_xgate, 1, 2)
+  assert qu.take_bitstring(sim.state()) == "111"
+
+def test_statevector_rejects_three_qubit_gates():
+  sim = qu.StateVectorSimulator(3)
+  with pytest.raises(ValueError):
+    sim.apply_gate(qu.controlled_xgate, 0, 1, 2)
+
+def test_statevector_rejects_repeated_qubits():
+  sim = qu.StateVectorSimulator(2)
+  with pytest.raises(ValueError):
+    sim.apply_gate(qu.controlled_xgate, 1, 1)
+
+def test_auto_engine_selection():
+  assert simulator.choose_engine(10, 50) == 'statevector'
+  assert simulator.choose_engine(22, 1) == 'tensornetwork'
+  assert simulator.choose_engine(40, 10) == 'tensornetwork'
+
+def test_simulate_passes_truncation_to_mps():
+  rng = random.Random(5)
+  operations = random_operations(rng, 8, 60)
+  exact = simulator.simulate(8, operations, engine='statevector').get_tensor()
+  truncated = simulator.simulate(8, operations, engine='mps', max_bond=2).get_tensor()
+  assert not np.allclose(truncated, exact, atol=1e-6)
+  np.testing.assert_allclose(simulator.simulate(8, operations, max_bond=64).get_tensor(),
+                             exact, atol=1e-10)
+  with pytest.raises(ValueError):
+    simulator.simulate(8, operations, engine='statevector', max_bond=2)
+
+def test_circuit_depth():
+  operations = [(qu.hgate, 0), (qu.controlled_xgate, 0, 1), (qu.xgate, 2)]
+  assert simulator.circuit_depth(3, operations) == 2
+  with pytest.raises(ValueError):
+    simulator.simulate(2, [(qu.hgate,)])
+
+@pytest.mark.parametrize('engine', ['statevector', 'mps', 'tensornetwork'])
+def test_single_precision_engines(engine):
+  rng = random.Random(9)
+  operations = random_operations(rng, 4, 12)
+  reference = qu.simulate(4, operations, engine='statevector')
+  out = qu.simulate(4, operations, engine=engine, precision='complex64')
+  assert out.tensor.dtype == np.complex64
+  np.testing.assert_allclose(out.get_tensor(), reference.get_tensor(), atol=1e-5)
+
+def test_multi_qubit_gates_agree_across_engines():
+  rng = np.random.default_rng(5)
+  matrix, _ = np.linalg.qr(rng.normal(size=(8, 8)) + 1j * rng.normal(size=(8, 8)))
+  operations = [(qu.hgate, 0), (qu.hgate, 3), (qu.rxgate(0.4), 1),
+                (qu.controlled_gate(qu.ygate, 2), 3, 0, 2),
+                (qu.unitary_gate(matrix), 2, 1, 3),
+                (qu.controlled_gate(qu.rygate(0.9), 3), 1, 2, 3, 0)]
+  reference = qu.simulate(4, operations, engine='tensornetwork').get_tensor()
+  out = qu.simulate(4, operations, engine='statevector').get_tensor()
+  np.testing.assert_allclose(out, reference, atol=1e-12)
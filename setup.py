@@ -36,7 +36,7 @@ setup(
   url='http://github.com/travmatth/quantn',
   author='Travis Matthews',
   author_email='trav.matth+qtn@gmail.com',
-  python_requires=('>=3.6.0'),
+  python_requires=('>=3.7.0'),
   install_requires=requirements,
   license='Apache 2.0',
   description=description,